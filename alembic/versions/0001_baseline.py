@@ -0,0 +1,88 @@
+"""Baseline schema, as created by ``create_tables``
+
+Databases created before migrations existed already have these tables,
+so each one is only created when missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-05-06 10:23:32
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0001"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String()),
+            sa.Column("username", sa.String()),
+            sa.Column("hashed_password", sa.String()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_name", "users", ["name"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if "products" not in existing:
+        op.create_table(
+            "products",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String()),
+            sa.Column("price", sa.Float()),
+        )
+        op.create_index("ix_products_id", "products", ["id"])
+
+    if "receipts" not in existing:
+        op.create_table(
+            "receipts",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column(
+                "created_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+            ),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("payment_type", sa.String()),
+            sa.Column("payment_amount", sa.Float()),
+            sa.Column("total", sa.Float()),
+            sa.Column("change_given", sa.Float()),
+        )
+        op.create_index("ix_receipts_id", "receipts", ["id"])
+
+    if "sale_items" not in existing:
+        op.create_table(
+            "sale_items",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id")),
+            sa.Column("quantity", sa.Float()),
+            sa.Column("total_price", sa.Float()),
+            sa.Column("receipt_id", sa.Integer(), sa.ForeignKey("receipts.id")),
+        )
+        op.create_index("ix_sale_items_id", "sale_items", ["id"])
+
+    if "receipt_items" not in existing:
+        op.create_table(
+            "receipt_items",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("receipt_id", sa.Integer(), sa.ForeignKey("receipts.id")),
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id")),
+            sa.Column("quantity", sa.Float()),
+            sa.Column("total_price", sa.Float()),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("receipt_items")
+    op.drop_table("sale_items")
+    op.drop_table("receipts")
+    op.drop_table("products")
+    op.drop_table("users")
@@ -0,0 +1,66 @@
+"""Indexes for the receipt list filters and foreign keys
+
+The receipt list filters by user and optionally by payment type, and
+pages by ``(created_at, id)``; the covering columns let the filters on
+total and payment type be checked without visiting the heap. Sale items
+and receipt items are loaded by ``receipt_id``.
+
+The indexes are built concurrently, so existing deployments keep taking
+writes while they are created.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-05-20 12:00:00
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "0002"
+down_revision: str | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDEXES = [
+    (
+        "ix_receipts_user_id_created_at_id",
+        "receipts",
+        ["user_id", "created_at", "id"],
+        ["payment_type", "total"],
+    ),
+    (
+        "ix_receipts_user_id_payment_type_created_at_id",
+        "receipts",
+        ["user_id", "payment_type", "created_at", "id"],
+        ["total"],
+    ),
+    (
+        "ix_sale_items_receipt_id",
+        "sale_items",
+        ["receipt_id"],
+        ["product_id", "quantity", "total_price"],
+    ),
+    ("ix_receipt_items_receipt_id", "receipt_items", ["receipt_id"], []),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, include in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_include=include,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
@@ -0,0 +1,63 @@
+"""Hourly and daily sales rollups
+
+The tables are filled from the existing receipts; afterwards
+``crud.create_receipts`` keeps them up to date. ``python -m app.rollups``
+rebuilds them from scratch.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-05-27 12:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0003"
+down_revision: str | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+TABLES = {"sales_hourly": "hour", "sales_daily": "day"}
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    for table, granularity in TABLES.items():
+        if table not in existing:
+            op.create_table(
+                table,
+                sa.Column(
+                    "user_id",
+                    sa.Integer(),
+                    sa.ForeignKey("users.id"),
+                    primary_key=True,
+                ),
+                sa.Column("period_start", sa.DateTime(timezone=True), primary_key=True),
+                sa.Column("payment_type", sa.String(), primary_key=True),
+                sa.Column("receipts", sa.Integer(), nullable=False),
+                sa.Column("total", sa.Float(), nullable=False),
+                sa.Column("payment_amount", sa.Float(), nullable=False),
+            )
+
+        op.execute(f"DELETE FROM {table}")
+        op.execute(
+            f"""
+            INSERT INTO {table}
+                (user_id, period_start, payment_type, receipts, total, payment_amount)
+            SELECT user_id,
+                   date_trunc('{granularity}', created_at, 'UTC'),
+                   coalesce(payment_type, ''),
+                   count(*),
+                   sum(total),
+                   sum(payment_amount)
+            FROM receipts
+            GROUP BY 1, 2, 3
+            """
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_table(table)
@@ -0,0 +1,39 @@
+"""Product names stored with the sale items
+
+Receipts are printed from what was sold, so later product renames and
+price changes do not alter them. Existing sale items get the current
+product names.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-06-10 12:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0005"
+down_revision: str | None = "0004"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    columns = sa.inspect(op.get_bind()).get_columns("sale_items")
+    if "product_name" not in {column["name"] for column in columns}:
+        op.add_column("sale_items", sa.Column("product_name", sa.String()))
+    op.execute(
+        """
+        UPDATE sale_items
+        SET product_name = products.name
+        FROM products
+        WHERE products.id = sale_items.product_id
+          AND sale_items.product_name IS NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("sale_items", "product_name")
@@ -0,0 +1,320 @@
+"""Admission control for the database- and CPU-heavy routes.
+
+Each limiter runs at most ``limit`` requests at once. Requests beyond
+that wait in a bounded queue, served by priority and then in arrival
+order; when the queue is full, or a request waited too long, it is
+refused at once with ``Retry-After`` instead of piling up until every
+request times out. A request of a higher priority takes the queue place
+of the lowest priority request waiting, so receipt creation keeps
+flowing while reads are shed.
+
+The "database" limiter guards the receipt routes, sized to the
+connection pool by default; the "login" limiter guards ``/token``,
+whose bcrypt work is CPU bound. Logins also hold a "database" slot, at
+the lowest priority, so receipt writes and reads are admitted first.
+A streamed response keeps its slot until the body has been sent.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from enum import IntEnum
+
+from fastapi import Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette import status
+from starlette.background import BackgroundTask
+
+from app import logger as log
+from app.core.config import settings
+from app.database import get_pool_limits
+from app.metrics import Counter, Gauge, Histogram, registry
+
+logger = log.get_logger()
+
+
+class Priority(IntEnum):
+    """Order in which queued requests are admitted, lowest first."""
+
+    WRITE = 0
+    READ = 1
+    LOGIN = 2
+
+
+class AdmissionRejected(Exception):
+    """The request was refused, because the queue was full or it waited too long."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Limiter:
+    """Concurrency limit with a bounded priority queue.
+
+    Meant to be used from the event loop only, so it needs no locking.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        queue_size: int,
+        queue_timeout: float,
+        status_code: int = status.HTTP_503_SERVICE_UNAVAILABLE,
+        retry_after: int = 1,
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._arrivals = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _has_room(self) -> bool:
+        return self.limit <= 0 or self.in_flight < self.limit
+
+    async def acquire(self, priority: int = Priority.READ) -> None:
+        """Wait for a free slot.
+
+        Args:
+            priority (int): Queue priority, lower is admitted first.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out.
+        """
+        if self._has_room() and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            lowest = max(self._waiters, default=None)
+            if lowest is None or lowest[0] <= priority:
+                raise AdmissionRejected("queue_full")
+            self._waiters.remove(lowest)
+            heapq.heapify(self._waiters)
+            lowest[2].set_exception(AdmissionRejected("preempted"))
+
+        waiter = (
+            priority,
+            next(self._arrivals),
+            asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._waiters, waiter)
+        future = waiter[2]
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The slot was handed over just as the wait ended, pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected("timeout") from e
+            raise
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the first queued request if any."""
+        if self.limit <= 0 or self.in_flight <= self.limit:
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    def configure(
+        self, limit: int | None = None, queue_size: int | None = None
+    ) -> None:
+        """Change the limits, admitting or refusing queued requests to match.
+
+        Args:
+            limit (int | None): New concurrency limit, 0 admits everything.
+            queue_size (int | None): New queue size.
+        """
+        if limit is not None:
+            self.limit = limit
+        if queue_size is not None:
+            self.queue_size = queue_size
+        while self._waiters and self._has_room():
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+        while len(self._waiters) > self.queue_size:
+            lowest = max(self._waiters)
+            self._waiters.remove(lowest)
+            lowest[2].set_exception(AdmissionRejected("preempted"))
+        heapq.heapify(self._waiters)
+        logger.info(
+            f"Admission limiter {self.name}: limit {self.limit}, "
+            f"queue {self.queue_size}"
+        )
+
+    def stats(self) -> dict[str, float]:
+        """Get the limits and current usage."""
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+        }
+
+
+def _default_database_limit() -> int:
+    pool_size, max_overflow = get_pool_limits()
+    return pool_size + max_overflow
+
+
+limiters = {
+    "database": Limiter(
+        "database",
+        limit=(
+            _default_database_limit()
+            if settings.ADMISSION_DATABASE_LIMIT is None
+            else settings.ADMISSION_DATABASE_LIMIT
+        ),
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ),
+    "login": Limiter(
+        "login",
+        limit=(
+            2 * settings.PASSWORD_HASH_WORKERS
+            if settings.ADMISSION_LOGIN_LIMIT is None
+            else settings.ADMISSION_LOGIN_LIMIT
+        ),
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+    ),
+}
+
+rejected_total: Counter = registry.register(
+    Counter(
+        "admission_rejected_total",
+        "Requests refused by admission control.",
+        ("limiter", "reason"),
+    )
+)
+wait_seconds: Histogram = registry.register(
+    Histogram(
+        "admission_wait_seconds",
+        "Time requests waited for admission.",
+        ("limiter",),
+    )
+)
+
+
+def _gauge(field: str) -> Callable[[], dict[tuple[str, ...], float]]:
+    return lambda: {
+        (name,): limiter.stats()[field] for name, limiter in limiters.items()
+    }
+
+
+for _field, _documentation in (
+    ("limit", "Requests a limiter runs at once."),
+    ("queue_size", "Requests a limiter lets wait."),
+    ("in_flight", "Requests running under a limiter."),
+    ("queued", "Requests waiting for admission."),
+):
+    registry.register(
+        Gauge(f"admission_{_field}", _documentation, ("limiter",), _gauge(_field))
+    )
+
+
+class AdmissionSlot:
+    """Slot a request holds under a limiter, released exactly once."""
+
+    def __init__(self, limiter: Limiter) -> None:
+        self._limiter = limiter
+        self._held = True
+        self.streaming = False
+
+    def release(self) -> None:
+        if self._held:
+            self._held = False
+            self._limiter.release()
+
+    def hold_while_streaming(self, response: StreamingResponse) -> StreamingResponse:
+        """Keep the slot until the response body has been sent.
+
+        The route dependency exits before the body is streamed, so without
+        this a long export would keep its connection with no slot held.
+
+        Args:
+            response (StreamingResponse): Response the route returns.
+        """
+        body = response.body_iterator
+
+        async def body_then_release() -> AsyncIterator[str | bytes]:
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                self.release()
+
+        self.streaming = True
+        response.body_iterator = body_then_release()
+        # Runs even when the client went away before the body was started
+        response.background = BackgroundTask(self.release)
+        return response
+
+
+def admit(
+    name: str, priority: Priority
+) -> Callable[[], AsyncGenerator[AdmissionSlot, None]]:
+    """Get a route dependency running the request under a limiter.
+
+    Args:
+        name (str): Limiter name, a key of ``limiters``.
+        priority (Priority): Priority of the route's requests.
+    """
+    limiter = limiters[name]
+
+    async def dependency() -> AsyncGenerator[AdmissionSlot, None]:
+        started_at = time.perf_counter()
+        try:
+            await limiter.acquire(priority)
+        except AdmissionRejected as e:
+            rejected_total.inc((name, e.reason))
+            raise HTTPException(
+                status_code=limiter.status_code,
+                detail="Server is busy, retry later",
+                headers={"Retry-After": str(limiter.retry_after)},
+            )
+        wait_seconds.observe((name,), time.perf_counter() - started_at)
+        slot = AdmissionSlot(limiter)
+        try:
+            yield slot
+        finally:
+            if not slot.streaming:
+                slot.release()
+
+    return dependency
+
+
+admit_receipt_write = admit("database", Priority.WRITE)
+admit_receipt_read = admit("database", Priority.READ)
+
+
+async def admit_login(
+    hashing: AdmissionSlot = Depends(admit("login", Priority.LOGIN)),
+    database: AdmissionSlot = Depends(admit("database", Priority.LOGIN)),
+) -> None:
+    """Admit a login to the hashing threads, then to the database behind receipts.
+
+    Args:
+        hashing (AdmissionSlot): Slot of the "login" limiter.
+        database (AdmissionSlot): Slot of the "database" limiter.
+    """
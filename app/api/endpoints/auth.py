@@ -1,14 +1,17 @@
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app import crud, schemas
+from app import async_crud, schemas
+from app.admission import admit_login
 from app.core.config import settings
-from app.crud import pwd_context
-from app.dependencies import get_db
+from app.dependencies import get_read_session, get_session
+from app.replicas import replica_set
+from app.security import password_hasher
 
 ALGORITHM = "HS256"
 
@@ -30,44 +33,67 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 
-@router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+@router.post(
+    "/register",
+    response_model=schemas.User,
+    dependencies=[Depends(admit_login)],
+)
+async def register_user(
+    user: schemas.UserCreate,
+    response: Response,
+    db: Session | AsyncSession = Depends(get_session),
+):
     """Register a new user.
 
     Args:
         user (schemas.UserCreate): User data.
-        db (Session): Database session.
+        response (Response): Response to set the last write cookie on.
+        db (Session | AsyncSession): Database session.
     """
-    db_user = crud.get_user_by_username(db, username=user.username)
+    db_user = await async_crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.create_user(db=db, user=user)
+    created = await async_crud.create_user(db=db, user=user)
+    replica_set.mark_write(response)
+    return created
 
 
-@router.post("/token", response_description="Return a token")
+@router.post(
+    "/token",
+    response_description="Return a token",
+    dependencies=[Depends(admit_login)],
+)
 async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session | AsyncSession = Depends(get_read_session),
 ):
     """Login and return an access token.
 
     Args:
         form_data (OAuth2PasswordRequestForm): Form data.
-        db (Session): Database session.
+        db (Session | AsyncSession): Database session, reading from a replica.
     """
-    user = crud.get_user_by_username(db, username=form_data.username)
+    user = await async_crud.get_user_by_username(db, username=form_data.username)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    password_valid = pwd_context.verify(form_data.password, user.hashed_password)
+    password_valid, new_hash = await password_hasher.verify_and_update(
+        form_data.password, user.hashed_password
+    )
     if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # The stored hash uses an outdated work factor, upgrade it transparently
+        await async_crud.update_user_password_hash(
+            db, user=user, hashed_password=new_hash
+        )
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
@@ -0,0 +1,102 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app import schemas
+from app.admission import limiters
+from app.cache import (
+    CacheStats,
+    principal_cache,
+    product_cache,
+    receipt_text_cache,
+)
+from app.database import async_engine, engine, get_pool_stats
+from app.dependencies import require_admin_token
+from app.replicas import replica_set
+from app.security import password_hasher
+
+router = APIRouter(prefix="/health")
+
+
+def _cache_stats(stats: CacheStats) -> dict[str, float]:
+    return {**stats._asdict(), "hit_rate": stats.hit_rate}
+
+
+@router.get("/cache")
+def get_cache_stats() -> dict[str, dict[str, float]]:
+    """Get hit/miss counters of the in-process caches.
+
+    Returns:
+        dict[str, dict[str, float]]: Stats by cache name.
+    """
+    return {
+        "products": _cache_stats(product_cache.stats()),
+        "principals": _cache_stats(principal_cache.stats()),
+        "receipt_texts": _cache_stats(receipt_text_cache.stats()),
+    }
+
+
+@router.get("/password-hashing")
+def get_password_hashing_stats() -> dict[str, float]:
+    """Get queue depth and latency of the password hashing pool.
+
+    Returns:
+        dict[str, float]: Pool size, queue depth and hashing latency.
+    """
+    stats = password_hasher.stats()
+    return {**stats._asdict(), "average_seconds": stats.average_seconds}
+
+
+@router.get("/pool")
+def get_pool_usage() -> dict[str, dict[str, float]]:
+    """Get live usage and checkout wait times of the connection pools.
+
+    Returns:
+        dict[str, dict[str, float]]: Stats by engine name.
+    """
+    return {
+        "sync": get_pool_stats(engine.pool)._asdict(),
+        "async": get_pool_stats(async_engine.pool)._asdict(),
+    }
+
+
+@router.get("/replicas")
+def get_replica_status() -> dict[str, dict[str, Any]]:
+    """Get whether each read replica is in use and its pool usage.
+
+    Returns:
+        dict[str, dict[str, Any]]: Status by replica name.
+    """
+    return replica_set.stats()
+
+
+@router.get("/admission")
+def get_admission_limits() -> dict[str, dict[str, float]]:
+    """Get the limits and current usage of the admission limiters.
+
+    Returns:
+        dict[str, dict[str, float]]: Stats by limiter name.
+    """
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+@router.put("/admission/{name}", dependencies=[Depends(require_admin_token)])
+async def set_admission_limits(
+    name: str, limits: schemas.AdmissionLimits
+) -> dict[str, float]:
+    """Change the limits of an admission limiter in this worker.
+
+    Runs on the event loop, which owns the limiters.
+
+    Args:
+        name (str): Limiter name.
+        limits (schemas.AdmissionLimits): Limits to change; unset ones are kept.
+
+    Returns:
+        dict[str, float]: The limiter's new limits and usage.
+    """
+    limiter = limiters.get(name)
+    if limiter is None:
+        raise HTTPException(status_code=404, detail="Unknown limiter")
+    limiter.configure(limit=limits.limit, queue_size=limits.queue_size)
+    return limiter.stats()
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.metrics import registry
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> PlainTextResponse:
+    """Get request metrics in the Prometheus text format.
+
+    Returns:
+        PlainTextResponse: Metrics of this process.
+    """
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -1,41 +1,229 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app import crud
+from app import async_crud, crud, idempotency, schemas
 from app import logger as log
-from app import schemas
-from app.dependencies import get_current_user, get_db
-from app.models import Receipt, User
+from app.admission import AdmissionSlot, admit_receipt_read, admit_receipt_write
+from app.api.routing import json_route_class
+from app.async_crud import run_in_session
+from app.cache import receipt_text_cache
+from app.conditional import cache_headers, etag_matches, not_modified, receipt_etag
+from app.core.config import settings
+from app.dependencies import (
+    get_current_user,
+    get_read_session,
+    get_session,
+    track_receipt_write,
+)
+from app.export import MEDIA_TYPES, ExportFormat, stream_export
+from app.group_commit import receipt_group_writer
+from app.models import User
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.rendering import DEFAULT_LOCALE, LOCALES, get_template
+from app.replicas import replica_set
+from app.rollups import Granularity
+from app.streaming import iter_json_documents
 
 logger = log.get_logger()
 
-router = APIRouter()
+router = APIRouter(route_class=json_route_class)
 
 
-@router.post("/receipts/", response_model=schemas.ReceiptResponse)
-def create_receipt(
+@router.post(
+    "/receipts/",
+    response_model=schemas.ReceiptResponse,
+    dependencies=[Depends(admit_receipt_write), Depends(track_receipt_write)],
+)
+async def create_receipt(
     receipt: schemas.ReceiptCreate,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session | AsyncSession = Depends(get_session),
     user: User = Depends(get_current_user),
-) -> schemas.ReceiptResponse:
+    idempotency_key: str | None = Header(None, min_length=1, max_length=255),
+) -> schemas.ReceiptResponse | Response:
     """Create a new receipt in the database.
 
+    With an ``Idempotency-Key`` header the receipt is created only once:
+    retries get the stored response, marked with ``Idempotent-Replayed``,
+    and a retry arriving while the first request is still running waits
+    for it. Reusing a key for another receipt is refused with 422.
+
+    Without a key, and with ``RECEIPT_GROUP_COMMIT`` enabled, the receipt
+    is committed together with those of concurrent requests.
+
     Args:
         receipt (schemas.ReceiptCreate): Receipt data.
+        response (Response): Response to set the last write cookie on.
+        db (Session | AsyncSession): Database session.
+        user (User): User data.
+        idempotency_key (str | None): Key identifying the request across retries.
+
+    Returns:
+        schemas.ReceiptResponse | Response: Receipt data.
+    """
+    if idempotency_key is None:
+        if receipt_group_writer.running:
+            created = await receipt_group_writer.create_receipt(receipt, user)
+        else:
+            created = await async_crud.create_receipt(db=db, receipt=receipt, user=user)
+        replica_set.mark_write(response)
+        return created
+
+    try:
+        stored = await run_in_session(
+            db, idempotency.create_receipt, receipt, user, idempotency_key
+        )
+    except idempotency.IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for another receipt",
+        )
+    headers = {idempotency.REPLAYED_HEADER: "true"} if stored.replayed else None
+    stored_response = Response(
+        stored.body, media_type="application/json", headers=headers
+    )
+    replica_set.mark_write(stored_response)
+    return stored_response
+
+
+def _write_receipt_chunk(
+    db: Session, chunk: list[tuple[int, schemas.ReceiptCreate]], user: User
+) -> list[schemas.ReceiptBatchResult]:
+    """Store a chunk of batched receipts in one transaction.
+
+    If the transaction fails, the receipts are retried one by one
+    so that a single bad receipt does not reject its whole chunk.
+
+    Args:
         db (Session): Database session.
+        chunk (list[tuple[int, schemas.ReceiptCreate]]): Receipts with their batch index.
         user (User): User data.
 
     Returns:
-        schemas.ReceiptResponse: Receipt data.
+        list[schemas.ReceiptBatchResult]: Results in the order of the chunk.
     """
-    return crud.create_receipt(db=db, receipt=receipt, user=user)
+    try:
+        receipts = crud.create_receipts(
+            db=db, receipts=[receipt for _, receipt in chunk], user=user
+        )
+    except SQLAlchemyError:
+        db.rollback()
+        logger.warning("Receipt batch chunk failed, retrying receipts one by one")
+    else:
+        return [
+            schemas.ReceiptBatchResult(
+                index=index,
+                receipt=schemas.ReceiptResponse.model_validate(
+                    receipt, from_attributes=True
+                ),
+            )
+            for (index, _), receipt in zip(chunk, receipts, strict=True)
+        ]
+
+    results = []
+    for index, receipt_data in chunk:
+        try:
+            receipt = crud.create_receipt(db=db, receipt=receipt_data, user=user)
+        except SQLAlchemyError:
+            db.rollback()
+            logger.exception(f"Failed to store batched receipt #{index}")
+            results.append(
+                schemas.ReceiptBatchResult(index=index, error="Could not store receipt")
+            )
+        else:
+            results.append(
+                schemas.ReceiptBatchResult(
+                    index=index,
+                    receipt=schemas.ReceiptResponse.model_validate(
+                        receipt, from_attributes=True
+                    ),
+                )
+            )
+    return results
 
 
-@router.get("/receipts/", response_model=list[schemas.Receipt])
-def read_receipts(
-    db: Session = Depends(get_db),
+@router.post(
+    "/receipts/batch",
+    response_model=list[schemas.ReceiptBatchResult],
+    dependencies=[Depends(admit_receipt_write), Depends(track_receipt_write)],
+)
+async def create_receipts_batch(
+    request: Request,
+    response: Response,
+    db: Session | AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+) -> list[schemas.ReceiptBatchResult]:
+    """Create many receipts from one streamed request.
+
+    The body is either newline delimited JSON (``application/x-ndjson``)
+    or a JSON array of receipts. Receipts are validated as they arrive
+    and written in chunks of ``RECEIPT_BATCH_CHUNK_SIZE``, one transaction
+    per chunk. Invalid receipts get an error result and do not stop the batch.
+
+    Args:
+        request (Request): Incoming request with the streamed body.
+        response (Response): Response to set the last write cookie on.
+        db (Session | AsyncSession): Database session.
+        user (User): User data.
+
+    Returns:
+        list[schemas.ReceiptBatchResult]: One result per receipt, in body order.
+    """
+    results: list[schemas.ReceiptBatchResult] = []
+    chunk: list[tuple[int, schemas.ReceiptCreate]] = []
+    index = 0
+
+    async for document in iter_json_documents(request.stream()):
+        if index >= settings.RECEIPT_BATCH_MAX_SIZE:
+            results.append(
+                schemas.ReceiptBatchResult(
+                    index=index, error="Batch size limit exceeded"
+                )
+            )
+            break
+        if isinstance(document, ValueError):
+            results.append(schemas.ReceiptBatchResult(index=index, error=str(document)))
+        else:
+            try:
+                chunk.append((index, schemas.ReceiptCreate.model_validate(document)))
+            except ValidationError as e:
+                results.append(schemas.ReceiptBatchResult(index=index, error=str(e)))
+        index += 1
+
+        if len(chunk) >= settings.RECEIPT_BATCH_CHUNK_SIZE:
+            results.extend(await run_in_session(db, _write_receipt_chunk, chunk, user))
+            chunk = []
+
+    if chunk:
+        results.extend(await run_in_session(db, _write_receipt_chunk, chunk, user))
+
+    replica_set.mark_write(response)
+    results.sort(key=lambda result: result.index)
+    return results
+
+
+@router.get(
+    "/receipts/",
+    response_model=list[schemas.Receipt],
+    dependencies=[Depends(admit_receipt_read)],
+)
+async def read_receipts(
+    response: Response,
+    db: Session | AsyncSession = Depends(get_read_session),
     user: User = Depends(get_current_user),
     date_from: datetime | None = None,
     date_to: datetime | None = None,
@@ -43,11 +231,18 @@ def read_receipts(
     payment_type: str | None = None,
     skip: int = 0,
     limit: int = 10,
+    cursor: str | None = None,
 ) -> list[schemas.Receipt]:
     """Get receipts by user id. Optionally filter by date, total, and payment type.
 
+    Receipts are ordered by creation time. When more receipts follow,
+    the ``X-Next-Cursor`` response header holds a cursor for the next page;
+    pass it back as ``cursor`` with the same filters. Cursor pages cost the
+    same however deep they are, unlike ``skip``, which is kept for compatibility.
+
     Args:
-        db (Session): Database session.
+        response (Response): Response to set the next page cursor on.
+        db (Session | AsyncSession): Database session.
         user (User): User id.
         date_from (Optional[datetime], optional): Filter by date from. Defaults to None.
         date_to (Optional[datetime], optional): Filter by date to. Defaults to None.
@@ -55,81 +250,327 @@ def read_receipts(
         payment_type (Optional[str], optional): Filter by payment type. Defaults to None.
         skip (int, optional): Skip records. Defaults to 0.
         limit (int, optional): Limit records. Defaults to 10.
+        cursor (Optional[str], optional): Next page cursor. Defaults to None.
 
     Returns:
         List[Receipt]: List of receipts.
     """
-    query = crud.get_receipts_by_user(db=db, user_id=user.id)
-
-    if date_from:
-        query = query.filter(Receipt.created_at >= date_from)
-    if date_to:
-        query = query.filter(Receipt.created_at <= date_to)
-    if min_total:
-        query = query.filter(Receipt.total >= min_total)
-    if payment_type:
-        query = query.filter(Receipt.payment_type == payment_type)
-
-    receipts = query.offset(skip).limit(limit).all()
+    after = None
+    if cursor is not None:
+        if skip:
+            raise HTTPException(
+                status_code=400, detail="skip cannot be combined with cursor"
+            )
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # One extra row tells whether another page follows
+    receipts = await async_crud.get_receipts(
+        db=db,
+        user_id=user.id,
+        date_from=date_from,
+        date_to=date_to,
+        min_total=min_total,
+        payment_type=payment_type,
+        skip=skip,
+        limit=limit + 1,
+        after=after,
+        options=crud.RECEIPT_LIST_LOADING,
+    )
+    if len(receipts) > limit:
+        receipts = receipts[:limit]
+        # An empty page, e.g. with limit=0, has nothing to continue after
+        if receipts:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(receipts[-1])
     return receipts
 
 
-@router.get("/receipts/{receipt_id}/", response_model=schemas.Receipt)
-def read_receipt(
+@router.get(
+    "/receipts/summary",
+    response_model=schemas.SalesSummary,
+    dependencies=[Depends(admit_receipt_read)],
+)
+async def get_sales_summary(
+    date_from: datetime,
+    date_to: datetime,
+    db: Session | AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+    granularity: Granularity | None = None,
+) -> schemas.SalesSummary:
+    """Get the user's sales totals for a date range, per payment type.
+
+    Answered from the sales rollups, so it costs the same however
+    many receipts the range holds. The range is ``[date_from, date_to)``
+    with both bounds rounded down to whole hours (UTC).
+
+    Args:
+        date_from (datetime): Range start, inclusive.
+        date_to (datetime): Range end, exclusive.
+        db (Session | AsyncSession): Database session.
+        user (User): User id.
+        granularity (Optional[Granularity], optional): Also list the totals
+            per ``hour`` or ``day``. Defaults to None.
+
+    Returns:
+        schemas.SalesSummary: Sales totals.
+    """
+    totals = await async_crud.get_sales_summary(
+        db=db, user_id=user.id, date_from=date_from, date_to=date_to
+    )
+    periods = None
+    if granularity is not None:
+        periods = [
+            schemas.SalesPeriod(**period._asdict())
+            for period in await async_crud.get_sales_periods(
+                db=db,
+                user_id=user.id,
+                granularity=granularity,
+                date_from=date_from,
+                date_to=date_to,
+            )
+        ]
+    return schemas.SalesSummary(
+        date_from=date_from,
+        date_to=date_to,
+        receipts=sum(row.receipts for row in totals),
+        total=sum(row.total for row in totals),
+        payment_amount=sum(row.payment_amount for row in totals),
+        payment_types=[schemas.SalesTotals(**row._asdict()) for row in totals],
+        periods=periods,
+    )
+
+
+@router.get("/receipts/export", response_class=StreamingResponse)
+async def export_receipts(
+    admission: AdmissionSlot = Depends(admit_receipt_read),
+    user: User = Depends(get_current_user),
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    min_total: float | None = None,
+    payment_type: str | None = None,
+    format: ExportFormat = "csv",
+    gzip: bool = False,
+) -> StreamingResponse:
+    """Export the user's receipts with their sale items as one streamed file.
+
+    There is one row per sale item, ordered by receipt creation time.
+    Rows are streamed from a server-side cursor as they are read, so
+    any date range can be exported in a single request. The admission
+    slot is held until the whole file has been sent.
+
+    Args:
+        admission (AdmissionSlot): Slot of the "database" limiter.
+        user (User): User id.
+        date_from (Optional[datetime], optional): Filter by date from. Defaults to None.
+        date_to (Optional[datetime], optional): Filter by date to. Defaults to None.
+        min_total (Optional[float], optional): Filter by minimum total. Defaults to None.
+        payment_type (Optional[str], optional): Filter by payment type. Defaults to None.
+        format (ExportFormat, optional): ``csv`` or ``ndjson``. Defaults to ``csv``.
+        gzip (bool, optional): Compress the file with gzip. Defaults to False.
+
+    Returns:
+        StreamingResponse: Exported rows.
+    """
+    statement = crud.receipt_export_query(
+        user_id=user.id,
+        date_from=date_from,
+        date_to=date_to,
+        min_total=min_total,
+        payment_type=payment_type,
+    )
+    filename = f"receipts.{format}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return admission.hold_while_streaming(
+        StreamingResponse(
+            stream_export(statement, format, gzip=gzip),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+    )
+
+
+@router.get(
+    "/receipts/text",
+    response_class=StreamingResponse,
+    dependencies=[Depends(admit_receipt_read)],
+)
+async def print_receipts(
+    db: Session | AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    min_total: float | None = None,
+    payment_type: str | None = None,
+    limit: int = Query(1000, ge=1, le=settings.RECEIPT_PRINT_MAX_RECEIPTS),
+    width: int = Query(40, ge=40, le=120),
+    locale: str = DEFAULT_LOCALE,
+) -> StreamingResponse:
+    """Print many of the user's receipts as one streamed text, e.g. for a Z-report.
+
+    Receipts are ordered by creation time and separated by a blank line.
+    They are loaded as plain rows in two queries and rendered with the
+    compiled receipt template while the response streams.
+
+    Args:
+        db (Session | AsyncSession): Database session.
+        user (User): User id.
+        date_from (Optional[datetime], optional): Filter by date from. Defaults to None.
+        date_to (Optional[datetime], optional): Filter by date to. Defaults to None.
+        min_total (Optional[float], optional): Filter by minimum total. Defaults to None.
+        payment_type (Optional[str], optional): Filter by payment type. Defaults to None.
+        limit (int, optional): Limit receipts. Defaults to 1000.
+        width (int, optional): Line width. Defaults to 40.
+        locale (str, optional): Locale of the labels. Defaults to ``DEFAULT_LOCALE``.
+
+    Returns:
+        StreamingResponse: Receipt texts.
+    """
+    if locale not in LOCALES:
+        raise HTTPException(status_code=400, detail="Unknown locale")
+
+    rows = await async_crud.get_receipt_print_rows(
+        db=db,
+        user_id=user.id,
+        date_from=date_from,
+        date_to=date_to,
+        min_total=min_total,
+        payment_type=payment_type,
+        limit=limit,
+    )
+    template = get_template(width, locale)
+    return StreamingResponse(
+        template.render_many(rows), media_type="text/plain; charset=utf-8"
+    )
+
+
+@router.get(
+    "/receipts/{receipt_id}/",
+    response_model=schemas.Receipt,
+    dependencies=[Depends(admit_receipt_read)],
+)
+async def read_receipt(
     receipt_id: int,
-    db: Session = Depends(get_db),
+    db: Session | AsyncSession = Depends(get_session),
     user: User = Depends(get_current_user),
 ) -> schemas.Receipt | None:
     """Get a receipt by user id and receipt id.
 
     Args:
         receipt_id (int): Receipt id.
-        db (Session): Database session.
+        db (Session | AsyncSession): Database session.
         user (User): User id.
 
     Returns:
         ReceiptResponse: Receipt data.
     """
-    receipt = crud.get_receipt_by_user_and_id(
-        db=db, receipt_id=receipt_id, user_id=user.id
+    receipt = await async_crud.get_receipt_by_user_and_id(
+        db=db,
+        receipt_id=receipt_id,
+        user_id=user.id,
+        options=crud.RECEIPT_DETAIL_LOADING,
     )
     if not receipt:
         raise HTTPException(status_code=404, detail="Receipt not found")
     return receipt
 
 
-@router.get("/receipts/public/{receipt_id}", response_model=schemas.Receipt)
-def get_receipt_public(
-    receipt_id: int, db: Session = Depends(get_db)
-) -> schemas.Receipt:
+@router.get(
+    "/receipts/public/{receipt_id}",
+    response_model=schemas.Receipt,
+    dependencies=[Depends(admit_receipt_read)],
+)
+async def get_receipt_public(
+    receipt_id: int,
+    request: Request,
+    response: Response,
+    db: Session | AsyncSession = Depends(get_read_session),
+) -> schemas.Receipt | Response:
     """Get a receipt by id.
 
+    The response is immutable and carries a strong ETag, so a matching
+    ``If-None-Match`` gets a 304 without loading the receipt.
+
     Args:
         receipt_id (int): Receipt id.
-        db (Session): Database session.
+        request (Request): Incoming request with the cache validators.
+        response (Response): Response to set the cache headers on.
+        db (Session | AsyncSession): Database session.
 
     Returns:
         schemas.Receipt: Receipt data.
     """
-    receipt = crud.get_receipt_by_id(db=db, receipt_id=receipt_id)
+    etag = receipt_etag(receipt_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    receipt = await async_crud.get_receipt_by_id(
+        db=db, receipt_id=receipt_id, options=crud.RECEIPT_DETAIL_LOADING
+    )
     if not receipt:
         raise HTTPException(status_code=404, detail="Receipt not found")
+    response.headers.update(cache_headers(etag))
     return receipt
 
 
-@router.get("/receipts/{receipt_id}/text")
-def get_receipt_text(receipt_id: int, db: Session = Depends(get_db)) -> str:
+def _render_receipt_text(db: Session, receipt_id: int, width: int) -> str | None:
+    """Render a receipt for printing, or return None if it does not exist.
+
+    Args:
+        db (Session): Database session.
+        receipt_id (int): Receipt id.
+        width (int): Line width.
+    """
+    receipt = crud.get_receipt_by_id(
+        db=db, receipt_id=receipt_id, options=crud.RECEIPT_DETAIL_LOADING
+    )
+    if not receipt:
+        return None
+    return receipt.format_receipt(width=width)
+
+
+@router.get(
+    "/receipts/{receipt_id}/text",
+    response_model=str,
+    dependencies=[Depends(admit_receipt_read)],
+)
+async def get_receipt_text(
+    receipt_id: int,
+    request: Request,
+    response: Response,
+    db: Session | AsyncSession = Depends(get_read_session),
+    width: int = Query(40, ge=40, le=120),
+) -> str | Response:
     """Get a receipt text by id.
 
+    Receipts never change once created, so the text is rendered
+    once per width and served from the receipt text cache afterwards.
+    A matching ``If-None-Match`` gets a 304 without any lookup.
+
     Args:
         receipt_id (int): Receipt id.
-        db (Session): Database session.
+        request (Request): Incoming request with the cache validators.
+        response (Response): Response to set the cache headers on.
+        db (Session | AsyncSession): Database session.
+        width (int, optional): Line width. Defaults to 40.
 
     Returns:
         str: Receipt text.
     """
-    receipt = crud.get_receipt_by_id(db=db, receipt_id=receipt_id)
-    if not receipt:
-        raise HTTPException(status_code=404, detail="Receipt not found")
-    logger.info(f"receipt text format:\n\n{receipt.format_receipt()}")
-    return receipt.format_receipt()
+    etag = receipt_etag(receipt_id, "text", width)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    text = receipt_text_cache.get((receipt_id, width))
+    if text is None:
+        text = await run_in_session(db, _render_receipt_text, receipt_id, width)
+        if text is None:
+            raise HTTPException(status_code=404, detail="Receipt not found")
+        receipt_text_cache.set((receipt_id, width), text)
+        logger.info(f"receipt text format:\n\n{text}")
+    response.headers.update(cache_headers(etag))
+    return text
@@ -0,0 +1,255 @@
+"""Awaitable counterparts of ``app.crud`` for both session kinds.
+
+With an ``AsyncSession`` the ``app.crud`` code runs on the psycopg 3 async
+driver through ``run_sync``; with a ``Session`` it runs in the threadpool.
+Returned objects must already hold everything the caller reads, because
+lazy loading is not available outside ``run_sync``.
+"""
+
+from collections.abc import Callable, Sequence
+from datetime import datetime
+from typing import Concatenate, ParamSpec, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.interfaces import ORMOption
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, rollups
+from app.models import Receipt, User
+from app.rendering import ItemRow, ReceiptRow
+from app.rollups import Granularity, SalesPeriod, SalesTotals
+from app.schemas import ReceiptCreate, UserCreate
+from app.security import password_hasher
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+async def run_in_session(
+    db: Session | AsyncSession,
+    fn: Callable[Concatenate[Session, P], T],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> T:
+    """Run ``fn(session, *args, **kwargs)`` without blocking the event loop.
+
+    Args:
+        db (Session | AsyncSession): Database session.
+        fn (Callable): Function taking a ``Session`` as its first argument.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def get_user_by_username(
+    db: Session | AsyncSession, username: str
+) -> User | None:
+    """Get user by username
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        username (str): Username
+    """
+    return await run_in_session(db, crud.get_user_by_username, username)
+
+
+async def create_user(db: Session | AsyncSession, user: UserCreate) -> User:
+    """Create a new user in the database
+
+    The password is hashed on the password hashing pool first,
+    so bcrypt never runs on the event loop.
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        user (UserCreate): UserCreate schema
+    """
+    hashed_password = await password_hasher.hash_async(user.password)
+    return await run_in_session(
+        db, crud.create_user, user, hashed_password=hashed_password
+    )
+
+
+async def update_user_password_hash(
+    db: Session | AsyncSession, user: User, hashed_password: str
+) -> User:
+    """Replace the stored password hash of a user
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        user (User): User model
+        hashed_password (str): New password hash
+    """
+    return await run_in_session(
+        db, crud.update_user_password_hash, user, hashed_password
+    )
+
+
+async def get_receipts(
+    db: Session | AsyncSession,
+    user_id: int,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    min_total: float | None = None,
+    payment_type: str | None = None,
+    skip: int = 0,
+    limit: int = 10,
+    after: tuple[datetime, int] | None = None,
+    options: Sequence[ORMOption] = crud.RECEIPT_LIST_LOADING,
+) -> list[Receipt]:
+    """Get receipts by user id, optionally filtered by date, total and payment type
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        user_id (int): User id
+        date_from (datetime | None): Filter by date from
+        date_to (datetime | None): Filter by date to
+        min_total (float | None): Filter by minimum total
+        payment_type (str | None): Filter by payment type
+        skip (int): Skip records
+        limit (int): Limit records
+        after (tuple[datetime, int] | None): ``(created_at, id)`` to continue after
+        options (Sequence[ORMOption]): Loader options for the receipts
+    """
+    return await run_in_session(
+        db,
+        crud.get_receipts,
+        user_id,
+        date_from=date_from,
+        date_to=date_to,
+        min_total=min_total,
+        payment_type=payment_type,
+        skip=skip,
+        limit=limit,
+        after=after,
+        options=options,
+    )
+
+
+async def get_receipt_print_rows(
+    db: Session | AsyncSession,
+    user_id: int,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    min_total: float | None = None,
+    payment_type: str | None = None,
+    limit: int = 1000,
+) -> list[tuple[ReceiptRow, list[ItemRow]]]:
+    """Get what printing a user's receipts needs, as plain rows
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        user_id (int): User id
+        date_from (datetime | None): Filter by date from
+        date_to (datetime | None): Filter by date to
+        min_total (float | None): Filter by minimum total
+        payment_type (str | None): Filter by payment type
+        limit (int): Limit receipts
+    """
+    return await run_in_session(
+        db,
+        crud.get_receipt_print_rows,
+        user_id,
+        date_from=date_from,
+        date_to=date_to,
+        min_total=min_total,
+        payment_type=payment_type,
+        limit=limit,
+    )
+
+
+async def get_receipt_by_user_and_id(
+    db: Session | AsyncSession,
+    receipt_id: int,
+    user_id: int,
+    options: Sequence[ORMOption] = crud.RECEIPT_DETAIL_LOADING,
+) -> Receipt | None:
+    """Get receipt by user id and receipt id
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        receipt_id (int): Receipt id
+        user_id (int): User id
+        options (Sequence[ORMOption]): Loader options for the receipt
+    """
+    return await run_in_session(
+        db, crud.get_receipt_by_user_and_id, receipt_id, user_id, options=options
+    )
+
+
+async def create_receipt(
+    db: Session | AsyncSession, receipt: ReceiptCreate, user: User
+) -> Receipt:
+    """Create a new receipt in the database
+    and add sale items to the receipt
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        receipt (ReceiptCreate): ReceiptCreate schema
+        user (User): User model
+    """
+    return await run_in_session(db, crud.create_receipt, receipt, user)
+
+
+async def create_receipts(
+    db: Session | AsyncSession, receipts: Sequence[ReceiptCreate], user: User
+) -> list[Receipt]:
+    """Create several receipts in one transaction
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        receipts (Sequence[ReceiptCreate]): ReceiptCreate schemas
+        user (User): User model
+    """
+    return await run_in_session(db, crud.create_receipts, receipts, user)
+
+
+async def get_receipt_by_id(
+    db: Session | AsyncSession,
+    receipt_id: int,
+    options: Sequence[ORMOption] = crud.RECEIPT_DETAIL_LOADING,
+) -> Receipt | None:
+    """Get receipt by id
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        receipt_id (int): Receipt id
+        options (Sequence[ORMOption]): Loader options for the receipt
+    """
+    return await run_in_session(db, crud.get_receipt_by_id, receipt_id, options=options)
+
+
+async def get_sales_summary(
+    db: Session | AsyncSession, user_id: int, date_from: datetime, date_to: datetime
+) -> list[SalesTotals]:
+    """Get a user's sales per payment type from the rollups
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        user_id (int): User id
+        date_from (datetime): Range start, inclusive
+        date_to (datetime): Range end, exclusive
+    """
+    return await run_in_session(db, rollups.get_summary, user_id, date_from, date_to)
+
+
+async def get_sales_periods(
+    db: Session | AsyncSession,
+    user_id: int,
+    granularity: Granularity,
+    date_from: datetime,
+    date_to: datetime,
+) -> list[SalesPeriod]:
+    """Get a user's sales per hour or day and payment type from the rollups
+
+    Args:
+        db (Session | AsyncSession): SQLAlchemy session
+        user_id (int): User id
+        granularity (Granularity): ``"hour"`` or ``"day"``
+        date_from (datetime): Range start, inclusive
+        date_to (datetime): Range end, exclusive
+    """
+    return await run_in_session(
+        db, rollups.get_periods, user_id, granularity, date_from, date_to
+    )
@@ -0,0 +1,330 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any, Generic, NamedTuple, TypeVar
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app import logger as log
+from app.core.config import settings
+from app.models import Product, User
+
+logger = log.get_logger()
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TTLCache(Generic[K, V]):
+    """Thread-safe LRU cache with bounded size and per-entry time to live."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: OrderedDict[K, tuple[V, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        """Get a value, counting the lookup as a hit or a miss.
+
+        Args:
+            key (K): Cache key.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self._timer():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        """Store a value, evicting the least recently used entries if full.
+
+        Args:
+            key (K): Cache key.
+            value (V): Value to store.
+            ttl (float | None): Lifetime in seconds. Defaults to the cache TTL.
+        """
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else self._timer() + ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *keys: K) -> None:
+        """Drop the given keys from the cache.
+
+        Args:
+            keys (K): Cache keys.
+        """
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def invalidate_if(self, predicate: Callable[[K, V], bool]) -> None:
+        """Drop every entry for which ``predicate(key, value)`` is true.
+
+        Args:
+            predicate (Callable[[K, V], bool]): Entry filter.
+        """
+        with self._lock:
+            for key, (value, _) in list(self._data.items()):
+                if predicate(key, value):
+                    del self._data[key]
+
+    def clear(self) -> None:
+        """Drop every entry from the cache."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> CacheStats:
+        """Get hit/miss counters and the current size."""
+        return CacheStats(self.hits, self.misses, len(self._data), self.maxsize)
+
+
+class CachedProduct(NamedTuple):
+    id: int
+    name: str
+    price: float
+
+
+class ProductCache:
+    """Product catalog cache keyed by ``Product.id``.
+
+    Products changed through the ORM are invalidated when their session
+    commits. Anything that changes prices behind the ORM's back (bulk
+    updates, other processes) must call ``invalidate`` or wait for the TTL.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._cache: TTLCache[int, CachedProduct] = TTLCache(maxsize, ttl, timer)
+
+    def get_many(
+        self, db: Session, product_ids: Iterable[int]
+    ) -> dict[int, CachedProduct]:
+        """Get products by id, loading all the missing ones with one query.
+
+        Unknown ids are left out of the result.
+
+        Args:
+            db (Session): SQLAlchemy session
+            product_ids (Iterable[int]): Product ids
+        """
+        products = {}
+        missing = set()
+        for product_id in set(product_ids):
+            product = self._cache.get(product_id)
+            if product is None:
+                missing.add(product_id)
+            else:
+                products[product_id] = product
+
+        if missing:
+            rows = db.execute(
+                select(Product.id, Product.name, Product.price).where(
+                    Product.id.in_(missing)
+                )
+            )
+            for row in rows:
+                product = CachedProduct(*row)
+                self._cache.set(product.id, product)
+                products[product.id] = product
+        return products
+
+    def preload(self, db: Session) -> int:
+        """Load the catalog into the cache, up to its size, with one query.
+
+        Args:
+            db (Session): SQLAlchemy session
+
+        Returns:
+            int: Number of products loaded.
+        """
+        rows = db.execute(
+            select(Product.id, Product.name, Product.price)
+            .order_by(Product.id)
+            .limit(self._cache.maxsize)
+        ).all()
+        for row in rows:
+            self._cache.set(row.id, CachedProduct(*row))
+        return len(rows)
+
+    def invalidate(self, *product_ids: int) -> None:
+        """Drop products from the cache, e.g. after their price changed.
+
+        Args:
+            product_ids (int): Product ids
+        """
+        self._cache.invalidate(*product_ids)
+
+    def clear(self) -> None:
+        """Drop the whole catalog from the cache."""
+        self._cache.clear()
+
+    def stats(self) -> CacheStats:
+        """Get hit/miss counters and the current size."""
+        return self._cache.stats()
+
+
+class PrincipalCache:
+    """Cache of users authenticated by a JWT, keyed by the token digest.
+
+    A hit means the exact same token was already verified, so neither
+    the signature check nor the user lookup has to run again. Entries
+    never outlive the token's ``exp`` claim.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        timer: Callable[[], float] = time.monotonic,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._cache: TTLCache[str, User] = TTLCache(maxsize, ttl, timer)
+        self._clock = clock
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, db: Session, token: str) -> User | None:
+        """Get the user a token was issued for, attached to the given session.
+
+        Args:
+            db (Session): SQLAlchemy session
+            token (str): JWT token
+        """
+        user = self._cache.get(self._digest(token))
+        if user is None:
+            return None
+        return db.merge(user, load=False)
+
+    def set(self, token: str, user: User, expires_at: float | None) -> None:
+        """Remember the user a verified token belongs to.
+
+        Args:
+            token (str): JWT token
+            user (User): User model
+            expires_at (float | None): Token ``exp`` claim as a Unix timestamp.
+        """
+        ttl = self._cache.ttl
+        if expires_at is not None:
+            remaining = expires_at - self._clock()
+            if remaining <= 0:
+                return
+            ttl = remaining if ttl is None else min(ttl, remaining)
+
+        # Keep a detached copy, so the cached user is not tied to this session
+        cached = User(
+            id=user.id,
+            name=user.name,
+            username=user.username,
+            hashed_password=user.hashed_password,
+        )
+        make_transient_to_detached(cached)
+        self._cache.set(self._digest(token), cached, ttl=ttl)
+
+    def revoke_user(self, *user_ids: int) -> None:
+        """Forget every token of the given users, e.g. after they changed.
+
+        Args:
+            user_ids (int): User ids
+        """
+        revoked = set(user_ids)
+        self._cache.invalidate_if(lambda _, user: user.id in revoked)
+
+    def clear(self) -> None:
+        """Forget every token."""
+        self._cache.clear()
+
+    def stats(self) -> CacheStats:
+        """Get hit/miss counters and the current size."""
+        return self._cache.stats()
+
+
+product_cache = ProductCache(
+    maxsize=settings.PRODUCT_CACHE_SIZE, ttl=settings.PRODUCT_CACHE_TTL_SECONDS
+)
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+# Printed receipt texts keyed by ``(receipt_id, width)``. They are rendered
+# from the stored sale items only, so entries never go stale
+receipt_text_cache: TTLCache[tuple[int, int], str] = TTLCache(
+    maxsize=settings.RECEIPT_TEXT_CACHE_SIZE
+)
+
+_CHANGED_PRODUCTS = "changed_product_ids"
+_CHANGED_USERS = "changed_user_ids"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_instances(session: Session, flush_context: Any) -> None:
+    changed_products = session.info.setdefault(_CHANGED_PRODUCTS, set())
+    changed_users = session.info.setdefault(_CHANGED_USERS, set())
+    for instance in (*session.dirty, *session.deleted):
+        if isinstance(instance, Product) and instance.id is not None:
+            changed_products.add(instance.id)
+        elif isinstance(instance, User) and instance.id is not None:
+            changed_users.add(instance.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_instances(session: Session) -> None:
+    changed_products = session.info.pop(_CHANGED_PRODUCTS, None)
+    if changed_products:
+        logger.info(f"Invalidating cached products: {sorted(changed_products)}")
+        product_cache.invalidate(*changed_products)
+    changed_users = session.info.pop(_CHANGED_USERS, None)
+    if changed_users:
+        logger.info(f"Revoking cached tokens of users: {sorted(changed_users)}")
+        principal_cache.revoke_user(*changed_users)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_changed_instances(session: Session, previous_transaction: Any) -> None:
+    session.info.pop(_CHANGED_PRODUCTS, None)
+    session.info.pop(_CHANGED_USERS, None)
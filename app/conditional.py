@@ -0,0 +1,64 @@
+from fastapi import Request, Response
+
+# Receipts never change, and their representations are built from stored
+# receipt and sale item columns only, never from products, so caches may
+# keep them for as long as they like
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Bump whenever the rendered representation of a receipt changes,
+# so that clients and proxies stop revalidating the old ETags.
+# 2: receipt texts print the stored product names and totals
+REPRESENTATION_VERSION = 2
+
+
+def receipt_etag(receipt_id: int, *variant: object) -> str:
+    """Build a strong ETag for a representation of an immutable receipt.
+
+    The receipt content never changes, and representations must not read
+    mutable data such as products, so the receipt id, the representation
+    variant and ``REPRESENTATION_VERSION`` identify it completely.
+
+    Args:
+        receipt_id (int): Receipt id.
+        variant (object): Parts telling representations apart, e.g. the width.
+    """
+    parts = ["receipt", str(receipt_id), *map(str, variant)]
+    return f'"{"-".join(parts)}-v{REPRESENTATION_VERSION}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether ``If-None-Match`` lists the given ETag.
+
+    Uses the weak comparison required for ``If-None-Match``. ``*`` is not
+    honoured: ETags are checked before the receipt is looked up, so it
+    would answer 304 for receipts that do not exist.
+
+    Args:
+        request (Request): Incoming request.
+        etag (str): Current ETag of the resource.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = (candidate.strip() for candidate in header.split(","))
+    return etag.removeprefix("W/") in (
+        candidate.removeprefix("W/") for candidate in candidates
+    )
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    """Get the validator and freshness headers of an immutable response.
+
+    Args:
+        etag (str): ETag of the response.
+    """
+    return {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    """Build a ``304 Not Modified`` response for a matching ETag.
+
+    Args:
+        etag (str): ETag of the response.
+    """
+    return Response(status_code=304, headers=cache_headers(etag))
@@ -66,6 +66,107 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    @computed_field  # type: ignore[misc]
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> PostgresDsn:
+        return MultiHostUrl.build(
+            scheme="postgresql+psycopg",
+            username=self.POSTGRES_USER,
+            password=self.POSTGRES_PASSWORD,
+            host=self.POSTGRES_SERVER,
+            port=self.POSTGRES_PORT,
+            path=self.POSTGRES_DB,
+        )
+
+    # "sync" runs database work in the threadpool, "async" on the event loop
+    DB_MODE: Literal["sync", "async"] = "sync"
+
+    # Connection pool of each engine
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    # Compiled SQL statements kept by SQLAlchemy per engine
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    # Set when connecting through a transaction-mode pooler such as PgBouncer
+    DB_EXTERNAL_POOLER: bool = False
+    # Pooled connections opened at startup, before the worker reports ready
+    DB_POOL_WARMUP: int = 0
+    # Connections all workers of a host may hold to each database server; when
+    # set, pool plus overflow of each worker's sync and async engine are capped
+    # at DB_CONNECTION_BUDGET // (2 * WEB_CONCURRENCY)
+    DB_CONNECTION_BUDGET: int | None = None
+
+    # Read replicas as a JSON list of DSNs; receipt reads and user lookups go there
+    DB_REPLICA_URIS: list[PostgresDsn] = []
+    # Seconds after a client wrote during which its reads stay on the primary,
+    # tracked with the last_write cookie
+    DB_REPLICA_STICKY_SECONDS: float = 5
+    # Seconds a replica whose connection failed is skipped before it is retried
+    DB_REPLICA_RETRY_SECONDS: float = 30
+
+    # Worker processes started by ``python -m app.server``
+    WEB_CONCURRENCY: int = 1
+    # Seconds a stopping worker waits for in-flight requests and receipt writes,
+    # as uvicorn's graceful shutdown timeout when served by python -m app.server
+    GRACEFUL_SHUTDOWN_SECONDS: int = 30
+
+    # Schema handling at startup: "create" runs create_all (development),
+    # "verify" only checks that migrations are at SCHEMA_VERSION (production)
+    STARTUP_SCHEMA: Literal["create", "verify", "skip"] = "create"
+    # Load the product catalog into the product cache at startup
+    STARTUP_PRELOAD_PRODUCTS: bool = False
+    # Sign and verify a token at startup, so the first login is not slower
+    STARTUP_PRELOAD_SIGNING_KEY: bool = False
+
+    # bcrypt work factor; stored hashes below it are upgraded on login
+    BCRYPT_ROUNDS: int = 12
+    # Threads dedicated to password hashing and verification
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Admission control: requests a limiter runs at once before queueing more.
+    # None sizes "database" to the connection pool and "login" to twice the
+    # password hashing threads; 0 admits everything
+    ADMISSION_DATABASE_LIMIT: int | None = None
+    ADMISSION_LOGIN_LIMIT: int | None = None
+    # Requests a limiter lets wait, and the longest wait in seconds
+    ADMISSION_QUEUE_SIZE: int = 100
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 5
+    # Sent as X-Admin-Token to change admission limits at runtime; unset disables it
+    ADMIN_TOKEN: str | None = None
+
+    # Receipts written per transaction by POST /receipts/batch
+    RECEIPT_BATCH_CHUNK_SIZE: int = 500
+    # Largest number of receipts accepted in one batch request
+    RECEIPT_BATCH_MAX_SIZE: int = 10_000
+    # Commit concurrent POST /receipts/ requests together in one transaction,
+    # gathering receipts for up to the window or until the group is full
+    RECEIPT_GROUP_COMMIT: bool = False
+    RECEIPT_GROUP_COMMIT_WINDOW_MS: float = 2
+    RECEIPT_GROUP_COMMIT_MAX_SIZE: int = 100
+    # Seconds a response stored under an Idempotency-Key is replayed
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 24 * 60 * 60
+    # Seconds between purges of expired idempotency keys; 0 disables purging
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: float = 300
+
+    # Product catalog cache: entries kept and their lifetime in seconds
+    PRODUCT_CACHE_SIZE: int = 10_000
+    PRODUCT_CACHE_TTL_SECONDS: float = 300
+    # Verified token cache: entries kept and their longest lifetime in seconds
+    PRINCIPAL_CACHE_SIZE: int = 10_000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 300
+    # Rendered receipt texts kept; receipts never change, so they do not expire
+    RECEIPT_TEXT_CACHE_SIZE: int = 10_000
+    # Most receipts printed by one bulk text request
+    RECEIPT_PRINT_MAX_RECEIPTS: int = 10_000
+    # Rows fetched from the server-side cursor per batch of a receipt export
+    EXPORT_BATCH_SIZE: int = 1000
+    # Encode receipt responses with FastJSONRoute instead of FastAPI's default
+    FAST_JSON_RESPONSES: bool = True
+    # Requests slower than this are logged with their SQL statements
+    SLOW_REQUEST_SECONDS: float = 1.0
+
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
     SMTP_PORT: int = 587
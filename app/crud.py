@@ -1,10 +1,33 @@
-from passlib.context import CryptContext
-from sqlalchemy.orm import Query, Session
+from collections import defaultdict
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
 
-from .models import Product, Receipt, SaleItem, User
+from sqlalchemy import ColumnElement, Select, insert, select, tuple_
+from sqlalchemy.orm import Query, Session, joinedload, raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.interfaces import ORMOption
+
+from . import rollups
+from .cache import product_cache
+from .models import Receipt, SaleItem, User
+from .rendering import ItemRow, ReceiptRow
 from .schemas import ReceiptCreate, UserCreate
+from .security import password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Receipt loader strategies. Sale items are loaded up front in a constant
+# number of queries; any other relationship access raises instead of
+# quietly issuing one more query per object.
+# Pages load items with one extra SELECT ... IN, so LIMIT counts receipts only
+RECEIPT_LIST_LOADING: tuple[ORMOption, ...] = (
+    selectinload(Receipt.sale_items).raiseload("*"),
+    raiseload("*"),
+)
+# Single receipts are loaded together with their items in one joined query
+RECEIPT_DETAIL_LOADING: tuple[ORMOption, ...] = (
+    joinedload(Receipt.sale_items).raiseload("*"),
+    raiseload("*"),
+)
 
 
 def get_user_by_username(db: Session, username: str) -> User | None:
@@ -17,14 +40,19 @@ def get_user_by_username(db: Session, username: str) -> User | None:
     return db.query(User).filter(User.username == username).first()
 
 
-def create_user(db: Session, user: UserCreate) -> User:
+def create_user(
+    db: Session, user: UserCreate, hashed_password: str | None = None
+) -> User:
     """Create a new user in the database
 
     Args:
         db (Session): SQLAlchemy session
         user (UserCreate): UserCreate schema
+        hashed_password (str | None): Password hash, if already computed.
+            Defaults to hashing ``user.password``.
     """
-    hashed_password = pwd_context.hash(user.password)
+    if hashed_password is None:
+        hashed_password = password_hasher.hash(user.password)
     db_user = User(
         name=user.name, username=user.username, hashed_password=hashed_password
     )
@@ -34,6 +62,19 @@ def create_user(db: Session, user: UserCreate) -> User:
     return db_user
 
 
+def update_user_password_hash(db: Session, user: User, hashed_password: str) -> User:
+    """Replace the stored password hash of a user
+
+    Args:
+        db (Session): SQLAlchemy session
+        user (User): User model
+        hashed_password (str): New password hash
+    """
+    user.hashed_password = hashed_password
+    db.commit()
+    return user
+
+
 def get_receipts_by_user(db: Session, user_id: int) -> Query[Receipt]:
     """Get receipts by user id
 
@@ -44,8 +85,175 @@ def get_receipts_by_user(db: Session, user_id: int) -> Query[Receipt]:
     return db.query(Receipt).filter(Receipt.user_id == user_id)
 
 
+def receipt_filters(
+    user_id: int,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    min_total: float | None = None,
+    payment_type: str | None = None,
+) -> list[ColumnElement[bool]]:
+    """Build the WHERE criteria of a user's receipt listing
+
+    Args:
+        user_id (int): User id
+        date_from (datetime | None): Filter by date from
+        date_to (datetime | None): Filter by date to
+        min_total (float | None): Filter by minimum total
+        payment_type (str | None): Filter by payment type
+    """
+    criteria = [Receipt.user_id == user_id]
+    if date_from:
+        criteria.append(Receipt.created_at >= date_from)
+    if date_to:
+        criteria.append(Receipt.created_at <= date_to)
+    if min_total:
+        criteria.append(Receipt.total >= min_total)
+    if payment_type:
+        criteria.append(Receipt.payment_type == payment_type)
+    return criteria
+
+
+def get_receipts(
+    db: Session,
+    user_id: int,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    min_total: float | None = None,
+    payment_type: str | None = None,
+    skip: int = 0,
+    limit: int = 10,
+    after: tuple[datetime, int] | None = None,
+    options: Sequence[ORMOption] = RECEIPT_LIST_LOADING,
+) -> list[Receipt]:
+    """Get receipts by user id, optionally filtered by date, total and payment type
+
+    Receipts are ordered by ``(created_at, id)``. Passing the position of
+    the last receipt of a page as ``after`` continues right behind it
+    (keyset pagination), which costs the same however deep the page is.
+
+    Args:
+        db (Session): SQLAlchemy session
+        user_id (int): User id
+        date_from (datetime | None): Filter by date from
+        date_to (datetime | None): Filter by date to
+        min_total (float | None): Filter by minimum total
+        payment_type (str | None): Filter by payment type
+        skip (int): Skip records
+        limit (int): Limit records
+        after (tuple[datetime, int] | None): ``(created_at, id)`` to continue after
+        options (Sequence[ORMOption]): Loader options for the receipts
+    """
+    query = db.query(Receipt).filter(
+        *receipt_filters(user_id, date_from, date_to, min_total, payment_type)
+    )
+    if after is not None:
+        query = query.filter(tuple_(Receipt.created_at, Receipt.id) > after)
+
+    return (
+        query.options(*options)
+        .order_by(Receipt.created_at, Receipt.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def receipt_export_query(
+    user_id: int,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    min_total: float | None = None,
+    payment_type: str | None = None,
+) -> Select[Any]:
+    """Build the query of a receipt export, one row per sale item
+
+    Receipts without sale items get one row with empty item columns.
+
+    Args:
+        user_id (int): User id
+        date_from (datetime | None): Filter by date from
+        date_to (datetime | None): Filter by date to
+        min_total (float | None): Filter by minimum total
+        payment_type (str | None): Filter by payment type
+    """
+    return (
+        select(
+            Receipt.id.label("receipt_id"),
+            Receipt.created_at,
+            Receipt.payment_type,
+            Receipt.payment_amount,
+            Receipt.total,
+            Receipt.change_given,
+            SaleItem.product_id,
+            SaleItem.product_name,
+            SaleItem.quantity,
+            SaleItem.total_price,
+        )
+        .select_from(Receipt)
+        .outerjoin(SaleItem, SaleItem.receipt_id == Receipt.id)
+        .where(*receipt_filters(user_id, date_from, date_to, min_total, payment_type))
+        .order_by(Receipt.created_at, Receipt.id, SaleItem.id)
+    )
+
+
+def get_receipt_print_rows(
+    db: Session,
+    user_id: int,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    min_total: float | None = None,
+    payment_type: str | None = None,
+    limit: int = 1000,
+) -> list[tuple[ReceiptRow, list[ItemRow]]]:
+    """Get what printing a user's receipts needs, as plain rows
+
+    Costs one query for the receipts and one for their items, which
+    hold everything a printed line needs.
+
+    Args:
+        db (Session): SQLAlchemy session
+        user_id (int): User id
+        date_from (datetime | None): Filter by date from
+        date_to (datetime | None): Filter by date to
+        min_total (float | None): Filter by minimum total
+        payment_type (str | None): Filter by payment type
+        limit (int): Limit receipts
+    """
+    receipts = db.execute(
+        select(
+            Receipt.id, Receipt.created_at, Receipt.payment_type, Receipt.payment_amount
+        )
+        .where(*receipt_filters(user_id, date_from, date_to, min_total, payment_type))
+        .order_by(Receipt.created_at, Receipt.id)
+        .limit(limit)
+    ).all()
+    if not receipts:
+        return []
+
+    items = db.execute(
+        select(
+            SaleItem.receipt_id,
+            SaleItem.quantity,
+            SaleItem.total_price,
+            SaleItem.product_name,
+        )
+        .where(SaleItem.receipt_id.in_([receipt.id for receipt in receipts]))
+        .order_by(SaleItem.receipt_id, SaleItem.id)
+    ).all()
+
+    items_by_receipt: dict[int, list[ItemRow]] = defaultdict(list)
+    for receipt_id, *item in items:
+        items_by_receipt[receipt_id].append(ItemRow(*item))
+    return [
+        (ReceiptRow(*receipt), items_by_receipt[receipt.id]) for receipt in receipts
+    ]
+
+
 def get_receipt_by_user_and_id(
-    db: Session, receipt_id: int, user_id: int
+    db: Session,
+    receipt_id: int,
+    user_id: int,
+    options: Sequence[ORMOption] = RECEIPT_DETAIL_LOADING,
 ) -> Receipt | None:
     """Get receipt by user id and receipt id
 
@@ -53,9 +261,11 @@ def get_receipt_by_user_and_id(
         db (Session): SQLAlchemy session
         receipt_id (int): Receipt id
         user_id (int): User id
+        options (Sequence[ORMOption]): Loader options for the receipt
     """
     return (
         db.query(Receipt)
+        .options(*options)
         .filter(Receipt.id == receipt_id, Receipt.user_id == user_id)
         .first()
     )
@@ -70,44 +280,116 @@ def create_receipt(db: Session, receipt: ReceiptCreate, user: User) -> Receipt:
         receipt (ReceiptCreate): ReceiptCreate schema
         user (User): User model
     """
-    new_receipt = Receipt(
-        user_id=user.id,
-        payment_type=receipt.payment_type,
-        payment_amount=receipt.payment_amount,
-        total=0,  # Initialize total to zero; it will be calculated based on sale items
-        change_given=0,  # Initialize change given, will be updated later
+    return create_receipts(db, [receipt], user)[0]
+
+
+def create_receipts(
+    db: Session, receipts: Sequence[ReceiptCreate], user: User, commit: bool = True
+) -> list[Receipt]:
+    """Create several receipts in one transaction
+
+    Args:
+        db (Session): SQLAlchemy session
+        receipts (Sequence[ReceiptCreate]): ReceiptCreate schemas
+        user (User): User model
+        commit (bool): Commit the transaction. Without it the caller must commit.
+    """
+    return create_receipts_for_users(
+        db, [(user.id, receipt) for receipt in receipts], commit=commit
     )
-    db.add(new_receipt)
-    db.flush()
-
-    total = 0
-    for item_data in receipt.sale_items:
-        product = db.query(Product).filter(Product.id == item_data.product_id).first()
-        if product:
-            total_price = product.price * item_data.quantity
-            sale_item = SaleItem(
-                product_id=product.id,
-                quantity=item_data.quantity,
-                total_price=total_price,
-                receipt=new_receipt,
-            )
-            db.add(sale_item)
-            total += total_price  # Update total as each item is added
-
-    # Update total and change given after all items are added
-    new_receipt.total = total
-    new_receipt.change_given = new_receipt.payment_amount - total
 
-    db.commit()
-    db.refresh(new_receipt)
-    return new_receipt
 
+def create_receipts_for_users(
+    db: Session, receipts: Sequence[tuple[int, ReceiptCreate]], commit: bool = True
+) -> list[Receipt]:
+    """Create receipts of any number of users in one transaction
+
+    Every product in the baskets is resolved through the product cache
+    (one query for all the misses), the receipt rows are inserted with
+    their final total and change (multi-row ``INSERT ... RETURNING``)
+    and all sale items are written with one bulk insert. The sales
+    rollups are updated in the same transaction.
+    Receipts are returned in the order given.
+
+    Args:
+        db (Session): SQLAlchemy session
+        receipts (Sequence[tuple[int, ReceiptCreate]]): User ids with their
+            ReceiptCreate schemas
+        commit (bool): Commit the transaction. Without it the caller must commit.
+    """
+    if not receipts:
+        return []
+
+    product_ids = {
+        item.product_id for _, receipt in receipts for item in receipt.sale_items
+    }
+    products = product_cache.get_many(db, product_ids)
+
+    receipt_rows = []
+    sale_item_rows = []
+    for user_id, receipt in receipts:
+        # Items with unknown products are skipped, as they always have been
+        sale_items = [
+            {
+                "product_id": item.product_id,
+                "product_name": products[item.product_id].name,
+                "quantity": item.quantity,
+                "total_price": products[item.product_id].price * item.quantity,
+            }
+            for item in receipt.sale_items
+            if item.product_id in products
+        ]
+        total = sum(item["total_price"] for item in sale_items)
+        receipt_rows.append(
+            {
+                "user_id": user_id,
+                "payment_type": receipt.payment_type,
+                "payment_amount": receipt.payment_amount,
+                "total": total,
+                "change_given": receipt.payment_amount - total,
+            }
+        )
+        sale_item_rows.append(sale_items)
+
+    new_receipts = list(
+        db.scalars(
+            insert(Receipt).returning(Receipt, sort_by_parameter_order=True),
+            receipt_rows,
+        )
+    )
+
+    for new_receipt, sale_items in zip(new_receipts, sale_item_rows, strict=True):
+        for item in sale_items:
+            item["receipt_id"] = new_receipt.id
+    flat_sale_items = [item for sale_items in sale_item_rows for item in sale_items]
+    new_sale_items: dict[int, list[SaleItem]] = defaultdict(list)
+    if flat_sale_items:
+        for sale_item in db.scalars(
+            insert(SaleItem).returning(SaleItem, sort_by_parameter_order=True),
+            flat_sale_items,
+        ):
+            new_sale_items[sale_item.receipt_id].append(sale_item)
+    rollups.add_receipts(db, [new_receipt.id for new_receipt in new_receipts])
+
+    # The receipts are brand new, so their collections are known without a reload
+    for new_receipt in new_receipts:
+        set_committed_value(new_receipt, "sale_items", new_sale_items[new_receipt.id])
+        set_committed_value(new_receipt, "items", [])
+    if commit:
+        db.commit()
+    return new_receipts
 
-def get_receipt_by_id(db: Session, receipt_id: int) -> Receipt | None:
+
+def get_receipt_by_id(
+    db: Session,
+    receipt_id: int,
+    options: Sequence[ORMOption] = RECEIPT_DETAIL_LOADING,
+) -> Receipt | None:
     """Get receipt by id
 
     Args:
         db (Session): SQLAlchemy session
         receipt_id (int): Receipt id
+        options (Sequence[ORMOption]): Loader options for the receipt
     """
-    return db.query(Receipt).filter(Receipt.id == receipt_id).first()
+    return db.query(Receipt).options(*options).filter(Receipt.id == receipt_id).first()
@@ -0,0 +1,163 @@
+import os
+import time
+from typing import Any, NamedTuple
+
+from sqlalchemy import URL, Engine, create_engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry, Pool, QueuePool
+
+from app.core.config import Settings, settings
+
+
+class PoolStats(NamedTuple):
+    size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+
+
+class _WaitTimingMixin:
+    """Measure how long checkouts wait for a pooled connection."""
+
+    checkouts = 0
+    timeouts = 0
+    wait_seconds_total = 0.0
+    wait_seconds_max = 0.0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()  # type: ignore[misc, no-any-return]
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started_at
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# Every worker opens a sync and an async engine to each database server
+ENGINES_PER_DATABASE = 2
+
+
+def get_pool_limits(config: Settings = settings) -> tuple[int, int]:
+    """Get ``pool_size`` and ``max_overflow`` of each of this worker's engines.
+
+    With ``DB_CONNECTION_BUDGET`` set, pool plus overflow of every engine
+    stay within its share of the budget, so the sync and async engines of
+    ``WEB_CONCURRENCY`` workers together never open more connections to
+    one database server than the budget allows. Each replica is a server
+    of its own and gets the same budget as the primary.
+
+    Args:
+        config (Settings): Settings to read the pool options from.
+    """
+    pool_size, max_overflow = config.DB_POOL_SIZE, config.DB_MAX_OVERFLOW
+    if config.DB_CONNECTION_BUDGET is None:
+        return pool_size, max_overflow
+    engines = max(config.WEB_CONCURRENCY, 1) * ENGINES_PER_DATABASE
+    share = max(config.DB_CONNECTION_BUDGET // engines, 1)
+    pool_size = min(pool_size, share)
+    return pool_size, min(max_overflow, share - pool_size)
+
+
+def _engine_options(config: Settings) -> dict[str, Any]:
+    pool_size, max_overflow = get_pool_limits(config)
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "query_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+def create_db_engine(
+    config: Settings = settings, url: str | URL | None = None, **kwargs: Any
+) -> Engine:
+    """Create the synchronous engine with the pool configured in settings.
+
+    Args:
+        config (Settings): Settings to read the database options from.
+        url (str | URL | None): Database to connect to. Defaults to the primary.
+        kwargs (Any): Extra ``create_engine`` arguments, overriding settings.
+    """
+    options = {**_engine_options(config), "poolclass": InstrumentedQueuePool}
+    url = url or str(config.SQLALCHEMY_DATABASE_URI)
+    return create_engine(url, **{**options, **kwargs})
+
+
+def create_async_db_engine(
+    config: Settings = settings, url: str | URL | None = None, **kwargs: Any
+) -> AsyncEngine:
+    """Create the psycopg 3 engine with the pool configured in settings.
+
+    With ``DB_EXTERNAL_POOLER`` server-side prepared statements are disabled,
+    as a transaction-mode pooler like PgBouncer may hand every transaction
+    a different server connection.
+
+    Args:
+        config (Settings): Settings to read the database options from.
+        url (str | URL | None): Database to connect to, with any ``postgresql``
+            driver. Defaults to the primary.
+        kwargs (Any): Extra ``create_async_engine`` arguments, overriding settings.
+    """
+    options = {**_engine_options(config), "poolclass": InstrumentedAsyncQueuePool}
+    if config.DB_EXTERNAL_POOLER:
+        options["connect_args"] = {"prepare_threshold": None}
+    if url is None:
+        url = str(config.SQLALCHEMY_ASYNC_DATABASE_URI)
+    url = make_url(url).set(drivername="postgresql+psycopg")
+    return create_async_engine(url, **{**options, **kwargs})
+
+
+def get_pool_stats(pool: Pool) -> PoolStats:
+    """Get live usage and wait time counters of a connection pool.
+
+    Args:
+        pool (Pool): Pool of an engine, e.g. ``engine.pool``.
+    """
+    if not isinstance(pool, QueuePool):
+        return PoolStats(0, 0, 0, 0, 0, 0, 0.0, 0.0)
+    return PoolStats(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        checked_in=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        checkouts=getattr(pool, "checkouts", 0),
+        timeouts=getattr(pool, "timeouts", 0),
+        wait_seconds_total=getattr(pool, "wait_seconds_total", 0.0),
+        wait_seconds_max=getattr(pool, "wait_seconds_max", 0.0),
+    )
+
+
+# The only engines of the process: every session and startup task shares them.
+# Engines do not connect until first used, so the unused one costs nothing.
+engine = create_db_engine()
+async_engine = create_async_db_engine()
+
+
+def _reset_pools_after_fork() -> None:
+    # A forked worker must never use connections its parent opened; replace
+    # the pools without closing the parent's connections from the child
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
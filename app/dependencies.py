@@ -1,24 +1,45 @@
-from collections.abc import Generator
+import secrets
+from collections.abc import AsyncGenerator, Callable, Generator
+from typing import Concatenate, ParamSpec, TypeVar
 
-from fastapi import Depends, HTTPException
+from fastapi import Cookie, Depends, Header, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 
-from app import logger
+from app import async_crud, logger
+from app.cache import principal_cache
 from app.core.config import settings
+from app.database import async_engine, engine
+from app.draining import receipt_writes
 from app.models import User
+from app.replicas import LAST_WRITE_COOKIE, RoutingSession, replica_set
 
 logger = logger.get_logger()
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+P = ParamSpec("P")
+T = TypeVar("T")
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+    bind=engine,
+    class_=RoutingSession,
+)
 Base = declarative_base()
 
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Settings JWT
@@ -31,17 +52,92 @@ def get_db() -> Generator[Session, None, None]:
     Returns:
         Generator[Session, None, None]: Database session.
     """
-    with Session(engine) as session:
+    with SessionLocal() as session:
+        yield session
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Get an asynchronous database session.
+
+    Returns:
+        AsyncGenerator[AsyncSession, None]: Database session.
+    """
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+async def get_session() -> AsyncGenerator[Session | AsyncSession, None]:
+    """Get a database session for the configured ``DB_MODE``.
+
+    In ``async`` mode this is an ``AsyncSession`` on the psycopg 3 driver,
+    otherwise a regular ``Session`` whose work runs in the threadpool.
+    Pass it to the ``async_crud`` functions, which handle both.
+
+    Returns:
+        AsyncGenerator[Session | AsyncSession, None]: Database session.
+    """
+    if settings.DB_MODE == "async":
+        async with AsyncSessionLocal() as async_session:
+            yield async_session
+        return
+
+    session = SessionLocal()
+    try:
         yield session
+    finally:
+        # Closing returns the connection to the pool, which may hit the network
+        await run_in_threadpool(session.close)
+
+
+async def run_in_new_session(
+    fn: Callable[Concatenate[Session, P], T], *args: P.args, **kwargs: P.kwargs
+) -> T:
+    """Run ``fn(session, *args, **kwargs)`` in a session of its own, outside a request.
+
+    Args:
+        fn (Callable): Function taking a ``Session`` as its first argument.
+    """
+    if settings.DB_MODE == "async":
+        async with AsyncSessionLocal() as async_session:
+            return await async_crud.run_in_session(async_session, fn, *args, **kwargs)
+
+    session = SessionLocal()
+    try:
+        return await async_crud.run_in_session(session, fn, *args, **kwargs)
+    finally:
+        await run_in_threadpool(session.close)
+
+
+async def get_read_session(
+    db: Session | AsyncSession = Depends(get_session),
+    last_write: str | None = Cookie(None, alias=LAST_WRITE_COOKIE),
+) -> Session | AsyncSession:
+    """Get the request's database session, with its reads sent to a replica.
 
+    This is the same session ``get_session`` gives, so declare it before
+    ``get_current_user`` to have the user lookup read from the replica too.
+    A client that just wrote sends the ``last_write`` cookie and keeps
+    reading from the primary.
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-):
+    Args:
+        db (Session | AsyncSession): Database session.
+        last_write (str | None): Time of the client's last write, if recent.
+    """
+    replica_set.route_reads(db, last_write)
+    return db
+
+
+async def get_current_user(
+    db: Session | AsyncSession = Depends(get_session),
+    token: str = Depends(oauth2_scheme),
+) -> User:
     """Get the current user.
 
+    Tokens seen before are served from the principal cache,
+    without verifying the signature or querying the database again.
+
     Args:
-        db (Session): Database session.
+        db (Session | AsyncSession): Database session.
         token (str): JWT token.
     """
     credentials_exception = HTTPException(
@@ -49,6 +145,12 @@ def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # Merging the cached user does not load anything, so no IO happens here
+    sync_session = db.sync_session if isinstance(db, AsyncSession) else db
+    user = principal_cache.get(sync_session, token)
+    if user is not None:
+        return user
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
         user_name: str = payload.get("sub")
@@ -56,7 +158,36 @@ def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == user_name).first()
+    user = await async_crud.get_user_by_username(db, username=user_name)
     if user is None:
         raise credentials_exception
+    principal_cache.set(token, user, expires_at=payload.get("exp"))
     return user
+
+
+async def track_receipt_write() -> AsyncGenerator[None, None]:
+    """Count a receipt write as in flight until it is done.
+
+    Writes arriving while the worker drains for shutdown are refused,
+    so the client retries them against another worker.
+    """
+    if not receipt_writes.accepting:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is shutting down",
+            headers={"Retry-After": "1"},
+        )
+    async with receipt_writes.track():
+        yield
+
+
+def require_admin_token(x_admin_token: str | None = Header(None)) -> None:
+    """Allow the request only with the ``ADMIN_TOKEN`` configured in settings.
+
+    Args:
+        x_admin_token (str | None): Token sent in the ``X-Admin-Token`` header.
+    """
+    if settings.ADMIN_TOKEN is None or not secrets.compare_digest(
+        (x_admin_token or "").encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
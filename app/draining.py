@@ -0,0 +1,49 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+
+class InFlight:
+    """Count work in progress, so a stopping worker can wait for it.
+
+    Once ``drain`` has been called no new work is admitted, until the
+    tracker is opened again on the next startup.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.accepting = True
+
+    @asynccontextmanager
+    async def track(self) -> AsyncIterator[None]:
+        """Mark the enclosed block as in flight."""
+        self.count += 1
+        try:
+            yield
+        finally:
+            self.count -= 1
+
+    def open(self) -> None:
+        """Admit new work again."""
+        self.accepting = True
+
+    async def drain(self, timeout: float, interval: float = 0.05) -> bool:
+        """Stop admitting work and wait for the work in flight to finish.
+
+        Args:
+            timeout (float): Longest wait in seconds.
+            interval (float): Seconds between checks.
+
+        Returns:
+            bool: Whether everything finished in time.
+        """
+        self.accepting = False
+        deadline = time.monotonic() + timeout
+        while self.count and time.monotonic() < deadline:
+            await asyncio.sleep(interval)
+        return not self.count
+
+
+# Receipt writes, which a worker lets finish before it closes its connections
+receipt_writes = InFlight()
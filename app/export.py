@@ -0,0 +1,151 @@
+"""Streamed receipt exports.
+
+An export reads its rows through a server-side cursor in batches of
+``EXPORT_BATCH_SIZE`` and encodes each batch as soon as it arrives, so
+memory stays flat however many receipts are exported. FastAPI closes
+request dependencies before the body streams, so exports hold their own
+connection for as long as the response is being sent.
+"""
+
+import csv
+import io
+import json
+import zlib
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
+from datetime import datetime
+from typing import Any, Literal
+
+from sqlalchemy import Row, Select
+
+from app.core.config import settings
+from app.database import async_engine, engine
+
+ExportFormat = Literal["csv", "ndjson"]
+
+MEDIA_TYPES: dict[ExportFormat, str] = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_csv(rows: Sequence[Row[Any]]) -> bytes:
+    """Encode rows as CSV lines.
+
+    Args:
+        rows (Sequence[Row[Any]]): Rows to encode.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([[_value(value) for value in row] for row in rows])
+    return buffer.getvalue().encode()
+
+
+def encode_ndjson(rows: Sequence[Row[Any]]) -> bytes:
+    """Encode rows as newline delimited JSON objects.
+
+    Args:
+        rows (Sequence[Row[Any]]): Rows to encode.
+    """
+    lines = [
+        json.dumps({key: _value(value) for key, value in row._mapping.items()})
+        for row in rows
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+class _Encoder:
+    """Turn batches of rows into response chunks, optionally gzipped."""
+
+    def __init__(self, columns: Sequence[str], fmt: ExportFormat, gzip: bool) -> None:
+        self.fmt = fmt
+        self.columns = columns
+        # wbits=31 writes a gzip container instead of a bare zlib stream
+        self._compressor = zlib.compressobj(wbits=31) if gzip else None
+
+    def _pack(self, data: bytes) -> bytes:
+        if self._compressor is None:
+            return data
+        # Flush every batch, so the client receives it without waiting for more
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def header(self) -> bytes:
+        if self.fmt != "csv":
+            return b""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(self.columns)
+        return self._pack(buffer.getvalue().encode())
+
+    def batch(self, rows: Sequence[Row[Any]]) -> bytes:
+        encode = encode_csv if self.fmt == "csv" else encode_ndjson
+        return self._pack(encode(rows))
+
+    def end(self) -> bytes:
+        return self._compressor.flush() if self._compressor is not None else b""
+
+
+def _columns(statement: Select[Any]) -> list[str]:
+    return list(statement.selected_columns.keys())
+
+
+def iter_export(
+    statement: Select[Any], fmt: ExportFormat, gzip: bool = False
+) -> Iterator[bytes]:
+    """Stream an export with the synchronous engine.
+
+    Args:
+        statement (Select[Any]): Rows to export.
+        fmt (ExportFormat): ``"csv"`` or ``"ndjson"``.
+        gzip (bool): Compress the output with gzip.
+    """
+    encoder = _Encoder(_columns(statement), fmt, gzip)
+    # The header goes out before the query runs, so the first byte is immediate
+    yield encoder.header()
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            yield_per=settings.EXPORT_BATCH_SIZE
+        ).execute(statement)
+        for rows in result.partitions():
+            yield encoder.batch(rows)
+    yield encoder.end()
+
+
+async def aiter_export(
+    statement: Select[Any], fmt: ExportFormat, gzip: bool = False
+) -> AsyncIterator[bytes]:
+    """Stream an export with the asynchronous engine.
+
+    Args:
+        statement (Select[Any]): Rows to export.
+        fmt (ExportFormat): ``"csv"`` or ``"ndjson"``.
+        gzip (bool): Compress the output with gzip.
+    """
+    encoder = _Encoder(_columns(statement), fmt, gzip)
+    yield encoder.header()
+    async with async_engine.connect() as connection:
+        result = await connection.stream(
+            statement, execution_options={"yield_per": settings.EXPORT_BATCH_SIZE}
+        )
+        async for rows in result.partitions():
+            yield encoder.batch(rows)
+    yield encoder.end()
+
+
+def stream_export(
+    statement: Select[Any], fmt: ExportFormat, gzip: bool = False
+) -> Iterable[bytes] | AsyncIterator[bytes]:
+    """Stream an export with the engine of the configured ``DB_MODE``.
+
+    Args:
+        statement (Select[Any]): Rows to export.
+        fmt (ExportFormat): ``"csv"`` or ``"ndjson"``.
+        gzip (bool): Compress the output with gzip.
+    """
+    if settings.DB_MODE == "async":
+        return aiter_export(statement, fmt, gzip)
+    return iter_export(statement, fmt, gzip)
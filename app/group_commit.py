@@ -0,0 +1,189 @@
+"""Group commit for receipt creation.
+
+With ``RECEIPT_GROUP_COMMIT`` enabled, ``POST /receipts/`` hands its
+receipt to a background writer instead of committing it itself. The
+writer waits up to ``RECEIPT_GROUP_COMMIT_WINDOW_MS`` after the first
+receipt of a group was queued, or until ``RECEIPT_GROUP_COMMIT_MAX_SIZE``
+receipts are queued, and stores the group in one transaction, so its
+receipts share one commit. While a group is written the next one
+gathers, so groups grow with the load.
+
+If a group's transaction fails, its receipts are written again one by
+one, and every request gets its own receipt or error. Receipts whose
+request went away before their group was written are dropped.
+"""
+
+import asyncio
+from collections import deque
+from typing import NamedTuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import crud
+from app import logger as log
+from app.core.config import settings
+from app.dependencies import run_in_new_session
+from app.metrics import COUNT_BUCKETS, Histogram, registry
+from app.models import Receipt, User
+from app.schemas import ReceiptCreate
+
+logger = log.get_logger()
+
+group_size: Histogram = registry.register(
+    Histogram(
+        "receipt_group_commit_size",
+        "Receipts committed together by the group commit writer.",
+        (),
+        buckets=COUNT_BUCKETS,
+    )
+)
+
+
+class PendingReceipt(NamedTuple):
+    user_id: int
+    receipt: ReceiptCreate
+    queued_at: float
+    future: asyncio.Future[Receipt]
+
+
+def write_group(
+    db: Session, receipts: list[tuple[int, ReceiptCreate]]
+) -> list[Receipt | SQLAlchemyError]:
+    """Store a group of receipts in one transaction
+
+    If the transaction fails, the receipts are retried one by one
+    so that a single bad receipt does not fail its whole group.
+
+    Args:
+        db (Session): SQLAlchemy session
+        receipts (list[tuple[int, ReceiptCreate]]): User ids with their receipts
+
+    Returns:
+        list[Receipt | SQLAlchemyError]: Receipt or error, in the order given.
+    """
+    try:
+        return list(crud.create_receipts_for_users(db, receipts))
+    except SQLAlchemyError:
+        db.rollback()
+        logger.warning("Receipt group commit failed, retrying receipts one by one")
+
+    results: list[Receipt | SQLAlchemyError] = []
+    for receipt in receipts:
+        try:
+            results.extend(crud.create_receipts_for_users(db, [receipt]))
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.exception("Failed to store receipt of a committed group")
+            results.append(e)
+    return results
+
+
+class GroupCommitWriter:
+    """Background task storing queued receipts in groups.
+
+    Meant to be used from the event loop only, so it needs no locking.
+    """
+
+    def __init__(self, window: float, max_size: int) -> None:
+        self.window = window
+        self.max_size = max_size
+        self._pending: deque[PendingReceipt] = deque()
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the writer on the running event loop."""
+        # Events bind to the loop they are first used on, so each start gets new ones
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write the receipts already queued, then stop the writer."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._arrived.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def create_receipt(self, receipt: ReceiptCreate, user: User) -> Receipt:
+        """Queue a receipt and wait until its group is written
+
+        Args:
+            receipt (ReceiptCreate): ReceiptCreate schema
+            user (User): User model
+
+        Raises:
+            RuntimeError: If the writer is not running.
+            SQLAlchemyError: If the receipt could not be stored.
+        """
+        if not self.running:
+            raise RuntimeError("Receipt group commit writer is not running")
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[Receipt] = loop.create_future()
+        self._pending.append(PendingReceipt(user.id, receipt, loop.time(), future))
+        self._arrived.set()
+        if len(self._pending) >= self.max_size:
+            self._full.set()
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._pending or not self._stopping:
+            if not self._pending:
+                self._arrived.clear()
+                await self._arrived.wait()
+                continue
+            remaining = self._pending[0].queued_at + self.window - loop.time()
+            if len(self._pending) < self.max_size and remaining > 0:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            group = [
+                self._pending.popleft()
+                for _ in range(min(self.max_size, len(self._pending)))
+            ]
+            await self._write(group)
+
+    async def _write(self, group: list[PendingReceipt]) -> None:
+        # A request cancelled while waiting has cancelled its future too
+        group = [pending for pending in group if not pending.future.done()]
+        if not group:
+            return
+        group_size.observe((), len(group))
+        results: list[Receipt | Exception]
+        try:
+            results = list(
+                await run_in_new_session(
+                    write_group,
+                    [(pending.user_id, pending.receipt) for pending in group],
+                )
+            )
+        except Exception as e:
+            logger.exception("Receipt group commit writer failed")
+            results = [e] * len(group)
+        for pending, result in zip(group, results, strict=True):
+            if pending.future.done():
+                continue
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
+
+
+receipt_group_writer = GroupCommitWriter(
+    window=settings.RECEIPT_GROUP_COMMIT_WINDOW_MS / 1000,
+    max_size=settings.RECEIPT_GROUP_COMMIT_MAX_SIZE,
+)
@@ -0,0 +1,136 @@
+"""Idempotency keys for receipt creation.
+
+A client sending ``POST /receipts/`` with an ``Idempotency-Key`` header
+may retry it safely: the receipt is created once and its response is
+stored, then replayed to every retry for ``IDEMPOTENCY_KEY_TTL_SECONDS``.
+
+The key row is inserted in the receipt's transaction, before the receipt.
+A concurrent request with the same key blocks on that row until the first
+transaction ends, then replays the stored response or, if the first one
+rolled back, creates the receipt itself. Expired keys are deleted by
+``purge_expired``, which the app runs every
+``IDEMPOTENCY_PURGE_INTERVAL_SECONDS``.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.models import IdempotencyKey, User
+from app.schemas import ReceiptCreate, ReceiptResponse
+
+# Set on responses replayed from an earlier request with the same key
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyKeyReused(ValueError):
+    """The key was already used for a request with another body."""
+
+
+class StoredResponse(NamedTuple):
+    body: str
+    replayed: bool
+
+
+def request_hash(receipt: ReceiptCreate) -> str:
+    """Get the digest identifying a receipt request.
+
+    Args:
+        receipt (ReceiptCreate): ReceiptCreate schema
+    """
+    return hashlib.sha256(receipt.model_dump_json().encode()).hexdigest()
+
+
+def _claim(
+    db: Session, user_id: int, key: str, digest: str, expires_at: datetime
+) -> bool:
+    # Waits for a transaction holding the same key; an expired key is taken over
+    statement = (
+        insert(IdempotencyKey)
+        .values(user_id=user_id, key=key, request_hash=digest, expires_at=expires_at)
+        .on_conflict_do_update(
+            index_elements=["user_id", "key"],
+            set_={"request_hash": digest, "response": None, "expires_at": expires_at},
+            where=IdempotencyKey.expires_at <= func.now(),
+        )
+        .returning(IdempotencyKey.user_id)
+    )
+    return db.execute(statement).first() is not None
+
+
+def create_receipt(
+    db: Session,
+    receipt: ReceiptCreate,
+    user: User,
+    key: str,
+    ttl_seconds: float = settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+) -> StoredResponse:
+    """Create a receipt once per key and return its stored response
+
+    Args:
+        db (Session): SQLAlchemy session
+        receipt (ReceiptCreate): ReceiptCreate schema
+        user (User): User model
+        key (str): Idempotency key sent by the client
+        ttl_seconds (float): Seconds the response is replayed for
+
+    Raises:
+        IdempotencyKeyReused: If the key was used for another receipt.
+    """
+    digest = request_hash(receipt)
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+    same_key = (IdempotencyKey.user_id == user.id) & (IdempotencyKey.key == key)
+    while not _claim(db, user.id, key, digest, expires_at):
+        stored = db.execute(
+            select(IdempotencyKey.request_hash, IdempotencyKey.response).where(same_key)
+        ).first()
+        if stored is None:
+            # Purged since the claim, try again
+            continue
+        # Nothing was written; committing, unlike a rollback, keeps ``user`` loaded
+        db.commit()
+        if stored.request_hash != digest:
+            raise IdempotencyKeyReused(key)
+        return StoredResponse(stored.response, replayed=True)
+
+    new_receipt = crud.create_receipts(db, [receipt], user, commit=False)[0]
+    body = ReceiptResponse.model_validate(new_receipt).model_dump_json()
+    db.execute(update(IdempotencyKey).where(same_key).values(response=body))
+    db.commit()
+    return StoredResponse(body, replayed=False)
+
+
+def purge_expired(db: Session, batch_size: int = 1000) -> int:
+    """Delete expired keys in batches, one transaction per batch
+
+    Rows locked by another purge or a request are skipped.
+
+    Args:
+        db (Session): SQLAlchemy session
+        batch_size (int): Keys deleted per transaction
+
+    Returns:
+        int: Number of keys deleted.
+    """
+    expired = (
+        select(IdempotencyKey.user_id, IdempotencyKey.key)
+        .where(IdempotencyKey.expires_at <= func.now())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    statement = delete(IdempotencyKey).where(
+        tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(expired)
+    )
+    purged = 0
+    while True:
+        deleted = db.execute(statement).rowcount
+        db.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
@@ -1,18 +1,35 @@
+import asyncio
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from jose import jwt
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 
-from app import logger
-from app.api.endpoints import auth, receipt
+from app import idempotency, logger
+from app.api.endpoints import auth, health, metrics, receipt
+from app.api.endpoints.auth import ALGORITHM, create_access_token
+from app.cache import product_cache
 from app.core.config import settings
-from app.models import create_tables
+from app.database import async_engine, engine, get_pool_limits
+from app.dependencies import run_in_new_session
+from app.draining import receipt_writes
+from app.group_commit import receipt_group_writer
+from app.metrics import MetricsMiddleware
+from app.models import SCHEMA_VERSION, create_tables
+from app.pagination import NEXT_CURSOR_HEADER
+from app.replicas import replica_set
 
 logger = logger.get_logger()
 
-
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
 )
+app.state.ready = False
+
+app.add_middleware(MetricsMiddleware)
 
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
@@ -24,15 +41,147 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
 
 
+async def verify_schema_version() -> None:
+    """Check in one query that the database is migrated to ``SCHEMA_VERSION``.
+
+    Raises:
+        RuntimeError: If the database is at another version or not migrated.
+    """
+    query = text("SELECT version_num FROM alembic_version")
+    try:
+        if settings.DB_MODE == "async":
+            async with async_engine.connect() as connection:
+                version = (await connection.execute(query)).scalar_one_or_none()
+        else:
+            with engine.connect() as connection:
+                version = connection.execute(query).scalar_one_or_none()
+    except Exception as e:
+        raise RuntimeError(
+            "Database is not migrated, run `alembic upgrade head`"
+        ) from e
+    if version != SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema is at {version}, this build needs {SCHEMA_VERSION}; "
+            "run `alembic upgrade head`"
+        )
+
+
+async def warm_pool(connections: int) -> None:
+    """Open pooled connections up front, so first requests do not pay for them.
+
+    Only as many as the pool keeps are opened, at most this worker's
+    ``pool_size`` as given by ``get_pool_limits``.
+
+    Args:
+        connections (int): Connections to open.
+    """
+    connections = min(connections, get_pool_limits()[0])
+    if connections <= 0:
+        return
+    if settings.DB_MODE == "async":
+        opened = [await async_engine.connect() for _ in range(connections)]
+        for async_connection in opened:
+            await async_connection.close()
+    else:
+
+        def open_connections() -> None:
+            opened = [engine.connect() for _ in range(connections)]
+            for connection in opened:
+                connection.close()
+
+        await run_in_threadpool(open_connections)
+    logger.info(f"Opened {connections} pooled database connections.")
+
+
+async def preload_products() -> None:
+    """Load the product catalog into the product cache."""
+    loaded = await run_in_new_session(product_cache.preload)
+    logger.info(f"Preloaded {loaded} products.")
+
+
+async def purge_idempotency_keys(interval: float) -> None:
+    """Delete expired idempotency keys every ``interval`` seconds, until cancelled.
+
+    Args:
+        interval (float): Seconds between purges.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            purged = await run_in_new_session(idempotency.purge_expired)
+        except Exception as e:
+            logger.error(f"Failed to purge idempotency keys: {e}")
+        else:
+            if purged:
+                logger.info(f"Purged {purged} expired idempotency keys.")
+
+
+def preload_signing_key() -> None:
+    """Sign and verify a throwaway token, initialising the JWT backend."""
+    token = create_access_token(data={"sub": "startup"})
+    jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+
+
 @app.on_event("startup")
 async def startup_event() -> None:
-    """Create tables when the app starts up."""
-    logger.info("Creating tables...")
-    create_tables()
+    """Prepare the schema, connections and caches, then report ready."""
+    receipt_writes.open()
+    if settings.STARTUP_SCHEMA == "create":
+        logger.info("Creating tables...")
+        await run_in_threadpool(create_tables)
+    elif settings.STARTUP_SCHEMA == "verify":
+        await verify_schema_version()
+    await warm_pool(settings.DB_POOL_WARMUP)
+    if settings.STARTUP_PRELOAD_PRODUCTS:
+        await preload_products()
+    if settings.STARTUP_PRELOAD_SIGNING_KEY:
+        preload_signing_key()
+    if settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS > 0:
+        app.state.purge_task = asyncio.create_task(
+            purge_idempotency_keys(settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS)
+        )
+    if settings.RECEIPT_GROUP_COMMIT:
+        receipt_group_writer.start()
+    app.state.ready = True
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    """Let receipt writes finish, then close pooled async connections,
+    which belong to this event loop."""
+    app.state.ready = False
+    purge_task = getattr(app.state, "purge_task", None)
+    if purge_task is not None:
+        purge_task.cancel()
+    # The server already gave in-flight requests, and the receipt writes they
+    # make, GRACEFUL_SHUTDOWN_SECONDS before shutting the app down, so the
+    # drain only stops new writes instead of waiting a second time
+    if not await receipt_writes.drain(timeout=0):
+        logger.warning(
+            f"Shutting down with {receipt_writes.count} receipt writes in flight"
+        )
+    await receipt_group_writer.stop()
+    await async_engine.dispose()
+    await replica_set.dispose()
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready() -> JSONResponse:
+    """Report whether this worker has finished starting up.
+
+    Returns:
+        JSONResponse: 200 once ready, 503 before that and while shutting down.
+    """
+    if not app.state.ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return JSONResponse({"status": "ready"})
 
 
 app.include_router(receipt.router)
 app.include_router(auth.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
@@ -0,0 +1,305 @@
+"""Request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and, through SQLAlchemy engine
+events, counts the statements it runs, the time spent in the database
+and the rows returned. Everything is labelled by the route template
+(``/receipts/{receipt_id}/``), never by the raw path, so the number of
+series stays bounded. Requests slower than ``SLOW_REQUEST_SECONDS`` are
+logged with a per-statement breakdown.
+"""
+
+import bisect
+import threading
+import time
+from collections.abc import Callable, Sequence
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import logger as log
+from app.core.config import settings
+
+logger = log.get_logger()
+
+LabelValues = tuple[str, ...]
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10_000, 100_000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    type = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str]
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: LabelValues, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_labels(self.labelnames, labels)} {value}"
+                for labels, value in sorted(self._values.items())
+            ]
+
+
+class Histogram:
+    """Histogram with labels and cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = SECONDS_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: count per bucket (the last one is +Inf), sum and count
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: LabelValues, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                labels, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        with self._lock:
+            items = sorted(
+                (labels, (list(counts), total[0]))
+                for labels, (counts, total) in self._values.items()
+            )
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts, strict=True):
+                cumulative += count
+                bucket_labels = _labels((*self.labelnames, "le"), (*labels, str(bound)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Gauge with labels, read from a callback when scraped."""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], dict[LabelValues, float]],
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {value}"
+            for labels, value in sorted(self._collect().items())
+        ]
+
+
+class Registry:
+    """Collection of metrics rendered together for a scrape."""
+
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Gauge | Histogram] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LABELS = ("method", "route")
+
+requests_total: Counter = registry.register(
+    Counter(
+        "http_requests_total", "HTTP requests handled.", (*REQUEST_LABELS, "status")
+    )
+)
+request_duration: Histogram = registry.register(
+    Histogram(
+        "http_request_duration_seconds", "Wall time of HTTP requests.", REQUEST_LABELS
+    )
+)
+request_statements: Histogram = registry.register(
+    Histogram(
+        "http_request_sql_statements",
+        "SQL statements run per HTTP request.",
+        REQUEST_LABELS,
+        COUNT_BUCKETS,
+    )
+)
+request_db_duration: Histogram = registry.register(
+    Histogram(
+        "http_request_db_duration_seconds",
+        "Time spent executing SQL per HTTP request.",
+        REQUEST_LABELS,
+    )
+)
+request_db_rows: Histogram = registry.register(
+    Histogram(
+        "http_request_db_rows",
+        "Rows returned by SQL statements per HTTP request.",
+        REQUEST_LABELS,
+        ROWS_BUCKETS,
+    )
+)
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+    rows: int = 0
+    # SQL text -> [executions, seconds]
+    breakdown: dict[str, list[float]] = field(default_factory=dict)
+
+    def record(self, statement: str, seconds: float, rows: int) -> None:
+        self.statements += 1
+        self.db_seconds += seconds
+        self.rows += rows
+        entry = self.breakdown.setdefault(statement, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+# Stats of the request being handled; copied into worker threads and greenlets
+_current_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    if _current_stats.get() is not None and context is not None:
+        context._metrics_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    stats = _current_stats.get()
+    started_at = getattr(context, "_metrics_started_at", None)
+    if stats is None or started_at is None:
+        return
+    # Server-side cursors report -1 until their rows are fetched
+    stats.record(statement, time.perf_counter() - started_at, max(cursor.rowcount, 0))
+
+
+def _route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    # Unmatched paths share one label, so scanners cannot add series
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _log_slow_request(
+    method: str, route: str, seconds: float, stats: RequestStats
+) -> None:
+    slowest = sorted(stats.breakdown.items(), key=lambda item: item[1][1], reverse=True)
+    lines = [
+        f"Slow request {method} {route}: {seconds * 1000:.1f}ms, "
+        f"{stats.statements} statements, {stats.db_seconds * 1000:.1f}ms in the "
+        f"database, {stats.rows} rows"
+    ]
+    for statement, (count, statement_seconds) in slowest[:5]:
+        sql = " ".join(statement.split())[:200]
+        lines.append(f"  {int(count)}x {statement_seconds * 1000:.1f}ms {sql}")
+    logger.warning("\n".join(lines))
+
+
+class MetricsMiddleware:
+    """Record wall time and database work of every HTTP request.
+
+    Written as plain ASGI middleware, so streamed responses are timed
+    until their last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        status = 500
+        started_at = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started_at
+            _current_stats.reset(token)
+            labels = (scope["method"], _route_template(scope))
+            requests_total.inc((*labels, str(status)))
+            request_duration.observe(labels, seconds)
+            request_statements.observe(labels, stats.statements)
+            request_db_duration.observe(labels, stats.db_seconds)
+            request_db_rows.observe(labels, stats.rows)
+            if seconds >= settings.SLOW_REQUEST_SECONDS:
+                _log_slow_request(*labels, seconds, stats)
@@ -3,18 +3,23 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
-    create_engine,
+    Text,
     func,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 from app import logger as log
+from app.rendering import DEFAULT_LOCALE, ItemRow, ReceiptRow, get_template
 
 Base = declarative_base()
 
+# Alembic revision this code expects; bump it together with every migration
+SCHEMA_VERSION = "0005"
+
 logger = log.get_logger()
 
 
@@ -49,9 +54,18 @@ class SaleItem(Base):  # type: ignore[misc, valid-type]
     Represents a product in a receipt."""
 
     __tablename__ = "sale_items"
+    __table_args__ = (
+        Index(
+            "ix_sale_items_receipt_id",
+            "receipt_id",
+            postgresql_include=["product_id", "quantity", "total_price"],
+        ),
+    )
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     product = relationship("Product", back_populates="sale_items")
+    # Name at the time of sale, so later renames do not change printed receipts
+    product_name = Column(String)
     quantity = Column(Float)
     total_price = Column(Float)
     receipt_id = Column(Integer, ForeignKey("receipts.id"))
@@ -64,6 +78,24 @@ class Receipt(Base):  # type: ignore[misc, valid-type]
     Represents a receipt in the system."""
 
     __tablename__ = "receipts"
+    # Migrations own these indexes, see alembic/versions/0002
+    __table_args__ = (
+        Index(
+            "ix_receipts_user_id_created_at_id",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_include=["payment_type", "total"],
+        ),
+        Index(
+            "ix_receipts_user_id_payment_type_created_at_id",
+            "user_id",
+            "payment_type",
+            "created_at",
+            "id",
+            postgresql_include=["total"],
+        ),
+    )
     id = Column(Integer, primary_key=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -74,41 +106,23 @@ class Receipt(Base):  # type: ignore[misc, valid-type]
     change_given = Column(Float)
     sale_items = relationship("SaleItem", back_populates="receipt")
 
-    def format_receipt(self, width: int = 40) -> str:
-        """Format receipt for printing."""
-        lines = ["ФОП Джонсонюк Борис Іванович ;)".center(width), "=" * width]
-
-        total = 0
-        for item in self.sale_items:
-            item_total = item.quantity * item.product.price
-            total += item_total
-            line = "{:<30}".format(f"{item.quantity} x {item.product.price:,.0f}")
-            lines.append(line)
-            line = "{:<20}{:>20,.2f}".format(
-                f"{item.product.name}", item_total
-            ).replace(",", " ")
-            lines.append(line)
-            if len(self.sale_items) > 1:
-                lines.append("-" * width)
-
-        lines.extend(
-            [
-                "=" * width,
-                "{:<10}{:>30,.2f}".format("СУМА", total).replace(",", " "),
-                f"{self.payment_type.upper():<10}{self.payment_amount:>30,.2f}".replace(
-                    ",", " "
-                ),
-                "{:<10}{:>30,.2f}".format("Решта", self.payment_amount - total).replace(
-                    ",", " "
-                ),
-                "=" * width,
-                f"Чек №{self.id}".center(width),
-                f"{self.created_at.strftime('%d.%m.%Y %H:%M')}".center(width),
-                "Дякуємо за покупку!".center(width),
-                "=" * width,
-            ]
+    def format_receipt(self, width: int = 40, locale: str = DEFAULT_LOCALE) -> str:
+        """Format receipt for printing.
+
+        Only stored sale item values are used, so the text never changes.
+
+        Args:
+            width (int): Line width. Defaults to 40.
+            locale (str): Locale of the labels. Defaults to ``DEFAULT_LOCALE``.
+        """
+        items = [
+            ItemRow(item.quantity, item.total_price, item.product_name)
+            for item in self.sale_items
+        ]
+        row = ReceiptRow(
+            self.id, self.created_at, self.payment_type, self.payment_amount
         )
-        return "\n".join(lines)
+        return get_template(width, locale).render(row, items)
 
 
 class ReceiptItem(Base):  # type: ignore[misc, valid-type]
@@ -118,7 +132,7 @@ class ReceiptItem(Base):  # type: ignore[misc, valid-type]
 
     __tablename__ = "receipt_items"
     id = Column(Integer, primary_key=True)
-    receipt_id = Column(Integer, ForeignKey("receipts.id"))
+    receipt_id = Column(Integer, ForeignKey("receipts.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Float)
     total_price = Column(Float)
@@ -126,6 +140,48 @@ class ReceiptItem(Base):  # type: ignore[misc, valid-type]
     receipt = relationship("Receipt", back_populates="items")
 
 
+class HourlySales(Base):  # type: ignore[misc, valid-type]
+    """Hourly sales rollup.
+
+    Receipt count and sums per user, payment type and UTC hour."""
+
+    __tablename__ = "sales_hourly"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period_start = Column(DateTime(timezone=True), primary_key=True)
+    payment_type = Column(String, primary_key=True)
+    receipts = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    payment_amount = Column(Float, nullable=False)
+
+
+class DailySales(Base):  # type: ignore[misc, valid-type]
+    """Daily sales rollup.
+
+    Receipt count and sums per user, payment type and UTC day."""
+
+    __tablename__ = "sales_daily"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period_start = Column(DateTime(timezone=True), primary_key=True)
+    payment_type = Column(String, primary_key=True)
+    receipts = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    payment_amount = Column(Float, nullable=False)
+
+
+class IdempotencyKey(Base):  # type: ignore[misc, valid-type]
+    """Idempotency key model.
+
+    Stored response of a request sent with an ``Idempotency-Key`` header."""
+
+    __tablename__ = "idempotency_keys"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    # SHA-256 of the request body, to refuse reusing a key for another request
+    request_hash = Column(String(64), nullable=False)
+    response = Column(Text)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
 User.receipts = relationship("Receipt", order_by=Receipt.id, back_populates="user")
 Receipt.items = relationship(
     "ReceiptItem", order_by=ReceiptItem.id, back_populates="receipt"
@@ -134,11 +190,14 @@ Receipt.items = relationship(
 
 # This function is used to create tables in the database
 def create_tables() -> None:
-    """Create tables in the database."""
-    from app.core.config import settings
+    """Create tables in the database.
+
+    Only creates missing tables, so existing databases must be upgraded
+    with ``alembic upgrade head`` instead.
+    """
+    from app.database import engine
 
     try:
-        engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
         Base.metadata.create_all(bind=engine)
         logger.info("Tables created successfully.")
     except Exception as e:
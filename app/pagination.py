@@ -0,0 +1,35 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from app.models import Receipt
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(receipt: Receipt) -> str:
+    """Encode the position of a receipt as an opaque page cursor.
+
+    Args:
+        receipt (Receipt): Last receipt of a page.
+    """
+    position = json.dumps([receipt.created_at.isoformat(), receipt.id])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a page cursor back into a ``(created_at, id)`` position.
+
+    Args:
+        cursor (str): Cursor from ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, receipt_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(receipt_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
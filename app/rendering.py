@@ -0,0 +1,152 @@
+"""Receipt text rendering.
+
+The layout of a printed receipt is compiled once per ``(width, locale)``
+into a ``ReceiptTemplate``: fixed lines are centred up front and line
+formats are bound ahead of time. Templates render from plain row tuples,
+so receipts can be printed straight from a query result without ORM
+objects.
+"""
+
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple
+
+DEFAULT_LOCALE = "uk"
+
+# Labels of a printed receipt by locale
+LOCALES: dict[str, dict[str, str]] = {
+    "uk": {
+        "seller": "ФОП Джонсонюк Борис Іванович ;)",
+        "total": "СУМА",
+        "change": "Решта",
+        "number": "Чек №{}",
+        "thanks": "Дякуємо за покупку!",
+    },
+    "en": {
+        "seller": "ФОП Джонсонюк Борис Іванович ;)",
+        "total": "TOTAL",
+        "change": "Change",
+        "number": "Receipt #{}",
+        "thanks": "Thank you for your purchase!",
+    },
+}
+
+
+class ReceiptRow(NamedTuple):
+    id: int
+    created_at: datetime
+    payment_type: str
+    payment_amount: float
+
+
+class ItemRow(NamedTuple):
+    quantity: float
+    total_price: float
+    name: str
+
+
+class ReceiptTemplate:
+    """Receipt layout compiled for one line width and locale."""
+
+    def __init__(self, width: int, locale: str) -> None:
+        labels = LOCALES[locale]
+        self.width = width
+        self.locale = locale
+        self._double_rule = "=" * width
+        self._single_rule = "-" * width
+        self._header = f"{labels['seller'].center(width)}\n{self._double_rule}\n"
+        self._footer = f"{labels['thanks'].center(width)}\n{self._double_rule}"
+        self._total_label = labels["total"]
+        self._change_label = labels["change"]
+        self._number = labels["number"]
+        self._quantity_line = "{:<30}".format
+        self._name_line = "{:<20}{:>20,.2f}".format
+        self._amount_line = "{:<10}{:>30,.2f}".format
+
+    def render(self, receipt: ReceiptRow, items: Sequence[ItemRow]) -> str:
+        """Render one receipt.
+
+        Args:
+            receipt (ReceiptRow): Receipt columns.
+            items (Sequence[ItemRow]): Sale items of the receipt, in order.
+        """
+        name_line = self._name_line
+        quantity_line = self._quantity_line
+        separator = len(items) > 1
+        lines = [self._header]
+
+        total = 0.0
+        for quantity, item_total, name in items:
+            price = item_total / quantity if quantity else 0.0
+            total += item_total
+            lines.append(quantity_line(f"{quantity} x {price:,.0f}"))
+            lines.append("\n")
+            lines.append(name_line(str(name), item_total).replace(",", " "))
+            lines.append("\n")
+            if separator:
+                lines.append(self._single_rule)
+                lines.append("\n")
+
+        amount_line = self._amount_line
+        width = self.width
+        lines.append(self._double_rule)
+        lines.append("\n")
+        lines.append(amount_line(self._total_label, total).replace(",", " "))
+        lines.append("\n")
+        lines.append(
+            f"{receipt.payment_type.upper():<10}{receipt.payment_amount:>30,.2f}".replace(
+                ",", " "
+            )
+        )
+        lines.append("\n")
+        lines.append(
+            amount_line(self._change_label, receipt.payment_amount - total).replace(
+                ",", " "
+            )
+        )
+        lines.append("\n")
+        lines.append(self._double_rule)
+        lines.append("\n")
+        lines.append(self._number.format(receipt.id).center(width))
+        lines.append("\n")
+        lines.append(receipt.created_at.strftime("%d.%m.%Y %H:%M").center(width))
+        lines.append("\n")
+        lines.append(self._footer)
+        return "".join(lines)
+
+    def render_many(
+        self,
+        receipts: Iterable[tuple[ReceiptRow, Sequence[ItemRow]]],
+        batch_size: int = 100,
+    ) -> Iterator[str]:
+        """Render receipts, each followed by a blank line, in batches.
+
+        Args:
+            receipts (Iterable[tuple[ReceiptRow, Sequence[ItemRow]]]): Receipts
+                with their sale items.
+            batch_size (int): Receipts joined into each yielded chunk.
+        """
+        render = self.render
+        batch = []
+        for receipt, items in receipts:
+            batch.append(render(receipt, items))
+            if len(batch) >= batch_size:
+                yield "\n\n".join(batch) + "\n\n"
+                batch = []
+        if batch:
+            yield "\n\n".join(batch) + "\n\n"
+
+
+@lru_cache(maxsize=64)
+def get_template(width: int = 40, locale: str = DEFAULT_LOCALE) -> ReceiptTemplate:
+    """Get the compiled receipt template for a width and locale.
+
+    Args:
+        width (int): Line width. Defaults to 40.
+        locale (str): Locale of the labels, one of ``LOCALES``.
+
+    Raises:
+        KeyError: If the locale is unknown.
+    """
+    return ReceiptTemplate(width, locale)
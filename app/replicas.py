@@ -0,0 +1,272 @@
+"""Send reads to PostgreSQL read replicas.
+
+A session routed to a replica runs its SELECTs there and everything else
+on the primary; once it has written, it stays on the primary, so it reads
+its own writes. A response to a write sets the ``last_write`` cookie, and
+requests carrying it read from the primary for ``DB_REPLICA_STICKY_SECONDS``
+after the write, hiding replication lag from the client across requests.
+The cookie travels with the client, so this holds whichever worker serves
+the next request, given the workers' clocks agree. A replica whose
+connection failed is skipped for ``DB_REPLICA_RETRY_SECONDS``, so reads
+fail over to the other replicas or the primary.
+"""
+
+import itertools
+import math
+import os
+import time
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from fastapi import Response
+from sqlalchemy import Engine, Select, event, make_url
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Mapper, Session
+
+from app import logger as log
+from app.core.config import settings
+from app.database import create_async_db_engine, create_db_engine, get_pool_stats
+
+logger = log.get_logger()
+
+# Cookie holding the time of the client's last write, in seconds since the epoch
+LAST_WRITE_COOKIE = "last_write"
+
+_ROUTE = "replica_route"
+
+
+class Replica:
+    """Engines of one read replica and whether it is currently usable."""
+
+    def __init__(
+        self,
+        name: str,
+        engine: Engine,
+        async_engine: AsyncEngine,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.failed_until = 0.0
+        self._timer = timer
+
+    @property
+    def healthy(self) -> bool:
+        return self.failed_until <= self._timer()
+
+
+class ReplicaSet:
+    """Pick a replica for each read, honouring stickiness and failures."""
+
+    def __init__(
+        self,
+        replicas: Sequence[Replica],
+        sticky_seconds: float,
+        retry_seconds: float,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.replicas: list[Replica] = []
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._timer = timer
+        self._turns = itertools.count()
+        for replica in replicas:
+            self.add(replica)
+
+    def add(self, replica: Replica) -> None:
+        """Start sending reads to a replica, watching its connections for errors.
+
+        Args:
+            replica (Replica): Replica to add.
+        """
+
+        def on_error(context: ExceptionContext) -> None:
+            if context.is_disconnect or isinstance(
+                context.sqlalchemy_exception, OperationalError
+            ):
+                self.mark_failed(replica)
+
+        for engine in (replica.engine, replica.async_engine.sync_engine):
+            event.listen(engine, "handle_error", on_error)
+        self.replicas.append(replica)
+
+    def mark_write(self, response: Response) -> None:
+        """Keep the client's reads on the primary for the sticky window.
+
+        Args:
+            response (Response): Response to the write, getting the cookie.
+        """
+        if self.replicas and self.sticky_seconds > 0:
+            response.set_cookie(
+                LAST_WRITE_COOKIE,
+                f"{time.time():.3f}",
+                max_age=math.ceil(self.sticky_seconds),
+                httponly=True,
+                samesite="lax",
+            )
+
+    def mark_failed(self, replica: Replica) -> None:
+        """Skip a replica until the retry interval has passed.
+
+        Args:
+            replica (Replica): Replica whose connection failed.
+        """
+        if replica.healthy:
+            logger.warning(
+                f"Replica {replica.name} failed, reading from the primary "
+                f"for {self.retry_seconds}s"
+            )
+        replica.failed_until = self._timer() + self.retry_seconds
+
+    def choose(self, last_write: str | None = None) -> Replica | None:
+        """Pick a healthy replica in turn, or ``None`` to read from the primary.
+
+        Args:
+            last_write (str | None): ``last_write`` cookie of the request, if sent.
+        """
+        if not self.replicas:
+            return None
+        if last_write is not None and self._wrote_recently(last_write):
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._turns) % len(healthy)]
+
+    def _wrote_recently(self, last_write: str) -> bool:
+        try:
+            written_at = float(last_write)
+        except ValueError:
+            return False
+        return time.time() - written_at < self.sticky_seconds
+
+    def route_reads(self, db: Session | AsyncSession, last_write: str | None) -> None:
+        """Send the session's reads to a replica, if one should serve them.
+
+        Nothing is connected here: the replica connection is checked out
+        by the session's first SELECT, so a request answered without a
+        query, such as a 304, never waits for a replica pool.
+
+        Args:
+            db (Session | AsyncSession): Session created by ``SessionLocal``
+                or ``AsyncSessionLocal``.
+            last_write (str | None): ``last_write`` cookie of the request, if sent.
+        """
+        replica = self.choose(last_write)
+        if replica is None:
+            return
+        if isinstance(db, AsyncSession):
+            db.sync_session.info[_ROUTE] = ReadRoute(self, replica, last_write, True)
+        else:
+            db.info[_ROUTE] = ReadRoute(self, replica, last_write, False)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """Get whether each replica is in use and its pool usage."""
+        return {
+            replica.name: {
+                "healthy": replica.healthy,
+                "sync": get_pool_stats(replica.engine.pool)._asdict(),
+                "async": get_pool_stats(replica.async_engine.pool)._asdict(),
+            }
+            for replica in self.replicas
+        }
+
+    async def dispose(self) -> None:
+        """Close pooled async connections, which belong to the event loop."""
+        for replica in self.replicas:
+            await replica.async_engine.dispose()
+
+
+class ReadRoute:
+    """Replica a session reads from, connected on the session's first SELECT."""
+
+    def __init__(
+        self,
+        replicas: ReplicaSet,
+        replica: Replica,
+        last_write: str | None,
+        use_async: bool,
+    ) -> None:
+        self.replicas = replicas
+        self.replica: Replica | None = replica
+        self.last_write = last_write
+        self.use_async = use_async
+        self.connected = False
+
+    def bind(self, session: Session) -> Engine | None:
+        """Get the engine to read from, or ``None`` to read from the primary.
+
+        The first call checks out the replica connection, so a replica
+        that cannot be reached fails over to the next one, or the primary,
+        instead of failing the query.
+
+        Args:
+            session (Session): Session about to run a SELECT.
+        """
+        while self.replica is not None:
+            replica = self.replica
+            bind = (
+                replica.async_engine.sync_engine if self.use_async else replica.engine
+            )
+            if self.connected:
+                return bind if replica.healthy else None
+            try:
+                session.connection(bind_arguments={"bind": bind})
+            except OperationalError:
+                self.replicas.mark_failed(replica)
+                self.replica = self.replicas.choose(self.last_write)
+                continue
+            self.connected = True
+            return bind
+        return None
+
+
+class RoutingSession(Session):
+    """Session that runs SELECTs on the replica it was routed to, if any.
+
+    Anything else, a flush included, goes to the primary and ends the
+    routing, so the rest of the session reads its own writes.
+    """
+
+    def get_bind(
+        self,
+        mapper: Mapper[Any] | type | None = None,
+        *,
+        clause: Any = None,
+        **kwargs: Any,
+    ) -> Engine:
+        route: ReadRoute | None = self.info.get(_ROUTE)
+        if route is not None:
+            if self._flushing or not isinstance(clause, Select):
+                del self.info[_ROUTE]
+            elif (bind := route.bind(self)) is not None:
+                return bind
+        return super().get_bind(mapper, clause=clause, **kwargs)  # type: ignore[return-value]
+
+
+def _create_replica(number: int, uri: str) -> Replica:
+    url = make_url(uri)
+    return Replica(
+        f"{number}:{url.host}:{url.port or 5432}/{url.database}",
+        create_db_engine(url=url),
+        create_async_db_engine(url=url),
+    )
+
+
+replica_set = ReplicaSet(
+    [_create_replica(n, str(uri)) for n, uri in enumerate(settings.DB_REPLICA_URIS)],
+    sticky_seconds=settings.DB_REPLICA_STICKY_SECONDS,
+    retry_seconds=settings.DB_REPLICA_RETRY_SECONDS,
+)
+
+
+def _reset_pools_after_fork() -> None:
+    for replica in replica_set.replicas:
+        replica.engine.dispose(close=False)
+        replica.async_engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
@@ -0,0 +1,244 @@
+"""Sales rollups maintained alongside the receipts.
+
+``sales_hourly`` and ``sales_daily`` hold the receipt count and sums per
+user, payment type and UTC hour or day. ``crud.create_receipts`` adds new
+receipts to them in the same transaction, so they are always exact, and
+a summary over any date range reads at most two days of hourly rows plus
+one daily row per day, however many receipts there are.
+
+Rebuild the rollups from the receipts with::
+
+    python -m app.rollups
+"""
+
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Any, Literal, NamedTuple
+
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    delete,
+    func,
+    literal_column,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import logger as log
+from app.models import DailySales, HourlySales, Receipt
+
+logger = log.get_logger()
+
+Granularity = Literal["hour", "day"]
+
+ROLLUPS: dict[Granularity, type[HourlySales] | type[DailySales]] = {
+    "hour": HourlySales,
+    "day": DailySales,
+}
+
+_COLUMNS = [
+    "user_id",
+    "period_start",
+    "payment_type",
+    "receipts",
+    "total",
+    "payment_amount",
+]
+
+
+class SalesTotals(NamedTuple):
+    payment_type: str
+    receipts: int
+    total: float
+    payment_amount: float
+
+
+class SalesPeriod(NamedTuple):
+    period_start: datetime
+    payment_type: str
+    receipts: int
+    total: float
+    payment_amount: float
+
+
+def _rollup_rows(
+    granularity: Granularity, *criteria: ColumnElement[bool]
+) -> Select[Any]:
+    # Literal SQL, so GROUP BY repeats exactly the selected expressions
+    period_start = func.date_trunc(
+        literal_column(f"'{granularity}'"), Receipt.created_at, literal_column("'UTC'")
+    )
+    payment_type = func.coalesce(Receipt.payment_type, literal_column("''"))
+    return (
+        select(
+            Receipt.user_id,
+            period_start,
+            payment_type,
+            func.count(),
+            func.sum(Receipt.total),
+            func.sum(Receipt.payment_amount),
+        )
+        .where(*criteria)
+        .group_by(Receipt.user_id, period_start, payment_type)
+        # Upserts lock rollup rows in one order, so concurrent writers cannot deadlock
+        .order_by(Receipt.user_id, period_start, payment_type)
+    )
+
+
+def add_receipts(db: Session, receipt_ids: Sequence[int]) -> None:
+    """Add receipts to the rollups, in the caller's transaction.
+
+    Args:
+        db (Session): SQLAlchemy session
+        receipt_ids (Sequence[int]): Ids of receipts not yet in the rollups
+    """
+    if not receipt_ids:
+        return
+    for granularity, model in ROLLUPS.items():
+        statement = insert(model).from_select(
+            _COLUMNS, _rollup_rows(granularity, Receipt.id.in_(receipt_ids))
+        )
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[model.user_id, model.period_start, model.payment_type],
+                set_={
+                    "receipts": model.receipts + statement.excluded.receipts,
+                    "total": model.total + statement.excluded.total,
+                    "payment_amount": model.payment_amount
+                    + statement.excluded.payment_amount,
+                },
+            )
+        )
+
+
+def backfill(db: Session) -> None:
+    """Rebuild the rollups from all receipts and commit.
+
+    Receipt writes wait until the rebuild commits, so none can be
+    counted twice or missed.
+
+    Args:
+        db (Session): SQLAlchemy session
+    """
+    db.execute(text("LOCK TABLE receipts IN SHARE MODE"))
+    for granularity, model in ROLLUPS.items():
+        db.execute(delete(model))
+        db.execute(insert(model).from_select(_COLUMNS, _rollup_rows(granularity)))
+    db.commit()
+
+
+def _floor(moment: datetime, granularity: Granularity) -> datetime:
+    # Naive datetimes are UTC, as created_at is stored
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    moment = moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == "day" else moment
+
+
+def _ceil(moment: datetime, granularity: Granularity) -> datetime:
+    floor = _floor(moment, granularity)
+    if floor == moment:
+        return floor
+    return floor + (timedelta(days=1) if granularity == "day" else timedelta(hours=1))
+
+
+def get_summary(
+    db: Session, user_id: int, date_from: datetime, date_to: datetime
+) -> list[SalesTotals]:
+    """Get a user's sales per payment type for ``[date_from, date_to)``
+
+    The bounds are rounded down to whole hours. Whole days are read from
+    the daily rollup and the hours around them from the hourly rollup.
+
+    Args:
+        db (Session): SQLAlchemy session
+        user_id (int): User id
+        date_from (datetime): Range start, inclusive
+        date_to (datetime): Range end, exclusive
+    """
+    start, end = _floor(date_from, "hour"), _floor(date_to, "hour")
+    first_day, last_day = _ceil(start, "day"), _floor(end, "day")
+    ranges: list[tuple[type[HourlySales] | type[DailySales], datetime, datetime]]
+    if first_day < last_day:
+        ranges = [
+            (HourlySales, start, first_day),
+            (DailySales, first_day, last_day),
+            (HourlySales, last_day, end),
+        ]
+    else:
+        ranges = [(HourlySales, start, end)]
+
+    parts = [
+        select(
+            model.payment_type, model.receipts, model.total, model.payment_amount
+        ).where(
+            model.user_id == user_id,
+            model.period_start >= lower,
+            model.period_start < upper,
+        )
+        for model, lower, upper in ranges
+        if lower < upper
+    ]
+    if not parts:
+        return []
+    rollup = parts[0].union_all(*parts[1:]).subquery()
+    rows = db.execute(
+        select(
+            rollup.c.payment_type,
+            func.sum(rollup.c.receipts),
+            func.sum(rollup.c.total),
+            func.sum(rollup.c.payment_amount),
+        )
+        .group_by(rollup.c.payment_type)
+        .order_by(rollup.c.payment_type)
+    )
+    return [SalesTotals(*row) for row in rows]
+
+
+def get_periods(
+    db: Session,
+    user_id: int,
+    granularity: Granularity,
+    date_from: datetime,
+    date_to: datetime,
+) -> list[SalesPeriod]:
+    """Get a user's sales per hour or day and payment type
+
+    The bounds are rounded down to whole periods.
+
+    Args:
+        db (Session): SQLAlchemy session
+        user_id (int): User id
+        granularity (Granularity): ``"hour"`` or ``"day"``
+        date_from (datetime): Range start, inclusive
+        date_to (datetime): Range end, exclusive
+    """
+    model = ROLLUPS[granularity]
+    rows = db.execute(
+        select(
+            model.period_start,
+            model.payment_type,
+            model.receipts,
+            model.total,
+            model.payment_amount,
+        )
+        .where(
+            model.user_id == user_id,
+            model.period_start >= _floor(date_from, granularity),
+            model.period_start < _floor(date_to, granularity),
+        )
+        .order_by(model.period_start, model.payment_type)
+    )
+    return [SalesPeriod(*row) for row in rows]
+
+
+if __name__ == "__main__":
+    from app.dependencies import SessionLocal
+
+    with SessionLocal() as session:
+        logger.info("Rebuilding sales rollups...")
+        backfill(session)
+        logger.info("Sales rollups rebuilt.")
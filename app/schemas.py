@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class UserCreate(BaseModel):
@@ -15,8 +15,7 @@ class User(BaseModel):
     name: str
     username: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class SaleItemCreate(BaseModel):
@@ -40,8 +39,7 @@ class Receipt(BaseModel):
     total: float
     sale_items: List[SaleItemCreate]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class SaleItemResponse(BaseModel):
@@ -59,5 +57,36 @@ class ReceiptResponse(BaseModel):
     change_given: float
     items: List[SaleItemResponse]
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ReceiptBatchResult(BaseModel):
+    index: int
+    receipt: ReceiptResponse | None = None
+    error: str | None = None
+
+
+class SalesTotals(BaseModel):
+    payment_type: str
+    receipts: int
+    total: float
+    payment_amount: float
+
+
+class SalesPeriod(SalesTotals):
+    period_start: datetime
+
+
+class SalesSummary(BaseModel):
+    date_from: datetime
+    date_to: datetime
+    receipts: int
+    total: float
+    payment_amount: float
+    payment_types: list[SalesTotals]
+    periods: list[SalesPeriod] | None = None
+
+
+class AdmissionLimits(BaseModel):
+    limit: int | None = Field(None, ge=0)
+    queue_size: int | None = Field(None, ge=0)
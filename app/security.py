@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple, TypeVar
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class HasherStats(NamedTuple):
+    workers: int
+    queue_depth: int
+    in_flight: int
+    completed: int
+    total_seconds: float
+    max_seconds: float
+
+    @property
+    def average_seconds(self) -> float:
+        return self.total_seconds / self.completed if self.completed else 0.0
+
+
+class PasswordHasher:
+    """Run password hashing and verification on a dedicated thread pool.
+
+    bcrypt is deliberately slow, so it must never run on the event loop.
+    The pool is sized separately from Starlette's threadpool, so a login
+    storm cannot take the threads that every other request needs.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int) -> None:
+        self.context = context
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hasher"
+        )
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._started = 0
+        self._completed = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _timed(self, func: Callable[..., T], *args: str) -> T:
+        with self._lock:
+            self._started += 1
+        started_at = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with self._lock:
+                self._completed += 1
+                self._total_seconds += elapsed
+                self._max_seconds = max(self._max_seconds, elapsed)
+
+    def _submit(self, func: Callable[..., T], *args: str) -> Future[T]:
+        with self._lock:
+            self._submitted += 1
+        return self._executor.submit(self._timed, func, *args)
+
+    def hash(self, password: str) -> str:
+        """Hash a password, blocking the calling (worker) thread until done.
+
+        Args:
+            password (str): Plain text password.
+        """
+        return self._submit(self.context.hash, password).result()
+
+    async def hash_async(self, password: str) -> str:
+        """Hash a password without blocking the event loop.
+
+        Args:
+            password (str): Plain text password.
+        """
+        return await asyncio.wrap_future(self._submit(self.context.hash, password))
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """Verify a password without blocking the event loop.
+
+        Args:
+            password (str): Plain text password.
+            hashed_password (str): Stored hash.
+
+        Returns:
+            tuple[bool, str | None]: Whether the password is valid and a new hash
+                if the stored one uses deprecated settings.
+        """
+        future = self._submit(self.context.verify_and_update, password, hashed_password)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> HasherStats:
+        """Get queue depth and hashing latency counters."""
+        with self._lock:
+            return HasherStats(
+                workers=self.max_workers,
+                queue_depth=self._submitted - self._started,
+                in_flight=self._started - self._completed,
+                completed=self._completed,
+                total_seconds=self._total_seconds,
+                max_seconds=self._max_seconds,
+            )
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once queued work is done."""
+        self._executor.shutdown(wait=True)
+
+
+# Hashes below the configured work factor are reported for rehashing on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
+
+password_hasher = PasswordHasher(
+    pwd_context, max_workers=settings.PASSWORD_HASH_WORKERS
+)
@@ -0,0 +1,59 @@
+"""Serve the API with several worker processes.
+
+Each worker is a fresh process that creates its own engines, each with
+its share of ``DB_CONNECTION_BUDGET`` as pool size. On SIGTERM workers stop
+accepting connections and let in-flight requests and receipt writes
+finish for up to ``GRACEFUL_SHUTDOWN_SECONDS``.
+
+    python -m app.server --workers 4
+"""
+
+import argparse
+import logging.config
+import os
+
+import uvicorn
+from uvicorn.config import LOGGING_CONFIG
+
+from app import logger as log
+from app.core.config import settings
+from app.database import get_pool_limits
+
+logger = log.get_logger()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.WEB_CONCURRENCY,
+        help="worker processes, one per core is a good start",
+    )
+    args = parser.parse_args()
+
+    # Workers read their settings from the environment, which is how each
+    # one learns how many siblings share the connection budget
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    config = settings.model_copy(update={"WEB_CONCURRENCY": args.workers})
+    pool_size, max_overflow = get_pool_limits(config)
+    # uvicorn configures its loggers only once it runs
+    logging.config.dictConfig(LOGGING_CONFIG)
+    logger.info(
+        f"Starting {args.workers} workers, each engine with a pool of "
+        f"{pool_size} connections and up to {max_overflow} overflow"
+    )
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        # The only deadline for draining: the app's shutdown does not wait again
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    main()
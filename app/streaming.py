@@ -0,0 +1,90 @@
+import codecs
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+# Largest single document we are willing to buffer while waiting for it to end
+MAX_DOCUMENT_SIZE = 1024 * 1024
+
+
+async def iter_json_documents(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[Any]:
+    """Decode JSON documents from a streamed request body as they arrive.
+
+    The body is either newline delimited JSON (one document per line)
+    or a single JSON array, whose elements are yielded one by one.
+    A malformed NDJSON line is yielded as a ``json.JSONDecodeError``
+    and decoding carries on with the next line. A malformed JSON array
+    cannot be resynchronised, so its error is yielded and decoding stops.
+
+    Args:
+        chunks (AsyncIterator[bytes]): Raw body chunks, e.g. ``request.stream()``.
+
+    Yields:
+        Any: Decoded documents or ``json.JSONDecodeError`` for malformed ones.
+    """
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    in_array: bool | None = None
+    array_closed = False
+    finished = False
+    chunk_iterator = aiter(chunks)
+
+    while not finished:
+        try:
+            chunk = await anext(chunk_iterator)
+            buffer += text_decoder.decode(chunk)
+        except StopAsyncIteration:
+            buffer += text_decoder.decode(b"", final=True)
+            finished = True
+
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position == len(buffer) or array_closed:
+                break
+
+            if in_array is None:
+                in_array = buffer[position] == "["
+                if in_array:
+                    position += 1
+                continue
+            if in_array and buffer[position] == ",":
+                position += 1
+                continue
+            if in_array and buffer[position] == "]":
+                array_closed = True
+                position += 1
+                continue
+
+            try:
+                document, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as error:
+                newline = buffer.find("\n", position)
+                if not in_array and newline != -1:
+                    # NDJSON: skip the broken line and carry on with the next one
+                    yield error
+                    position = newline + 1
+                    continue
+                if finished or len(buffer) - position > MAX_DOCUMENT_SIZE:
+                    yield error
+                    return
+                # The document is probably incomplete, wait for more data
+                break
+            else:
+                if end == len(buffer) and not finished and not in_array:
+                    # A bare number at the end of the buffer may still be growing
+                    if not isinstance(document, dict | list):
+                        break
+                yield document
+                position = end
+
+        buffer = buffer[position:]
+
+    if in_array and not array_closed:
+        yield json.JSONDecodeError("Unterminated JSON array", buffer, len(buffer))
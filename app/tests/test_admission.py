@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import AdmissionRejected, Limiter, Priority, limiters
+from app.api.endpoints import receipt
+from app.core.config import settings
+
+URL = f"http://{settings.DOMAIN}:8000"
+
+
+def test_queued_requests_are_admitted_by_priority() -> None:
+    """Test that freed slots go to writes before reads, in arrival order."""
+
+    async def scenario() -> list[str]:
+        limiter = Limiter("test", limit=1, queue_size=10, queue_timeout=1)
+        admitted = []
+
+        async def request(name: str, priority: Priority) -> None:
+            await limiter.acquire(priority)
+            admitted.append(name)
+            await asyncio.sleep(0.01)
+            limiter.release()
+
+        await limiter.acquire(Priority.READ)
+        tasks = [
+            asyncio.create_task(request(name, priority))
+            for name, priority in (
+                ("read 1", Priority.READ),
+                ("write 1", Priority.WRITE),
+                ("read 2", Priority.READ),
+                ("write 2", Priority.WRITE),
+            )
+        ]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        assert limiter.in_flight == 0
+        return admitted
+
+    assert asyncio.run(scenario()) == ["write 1", "write 2", "read 1", "read 2"]
+
+
+def test_full_queue_sheds_lowest_priority() -> None:
+    """Test that a full queue refuses reads but makes room for writes."""
+
+    async def scenario() -> None:
+        limiter = Limiter("test", limit=1, queue_size=1, queue_timeout=1)
+        await limiter.acquire()
+        read = asyncio.create_task(limiter.acquire(Priority.READ))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected, match="queue_full"):
+            await limiter.acquire(Priority.READ)
+
+        write = asyncio.create_task(limiter.acquire(Priority.WRITE))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected, match="preempted"):
+            await read
+
+        limiter.release()
+        await write
+        assert (limiter.in_flight, limiter.queued) == (1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_queue_wait_times_out() -> None:
+    """Test that a request waiting too long is refused and leaves the queue."""
+
+    async def scenario() -> None:
+        limiter = Limiter("test", limit=1, queue_size=1, queue_timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(AdmissionRejected, match="timeout"):
+            await limiter.acquire()
+        assert limiter.queued == 0
+
+        # Raising the limit at runtime lets queued requests in at once
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.configure(limit=2)
+        await waiting
+        assert limiter.in_flight == 2
+
+    asyncio.run(scenario())
+
+
+def test_overloaded_route_gets_retry_after(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a full limiter answers at once, with a rejection metric."""
+    limiter = limiters["database"]
+    monkeypatch.setattr(limiter, "limit", 1)
+    monkeypatch.setattr(limiter, "queue_size", 0)
+    monkeypatch.setattr(limiter, "in_flight", 1)
+
+    response = client.get(f"{URL}/receipts/public/6")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    metrics = client.get(f"{URL}/metrics").text
+    assert 'admission_rejected_total{limiter="database",reason="queue_full"}' in metrics
+    assert 'admission_in_flight{limiter="database"} 1' in metrics
+
+
+def test_limits_adjustable_at_runtime(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that limits change only with the admin token."""
+    limiter = limiters["login"]
+    monkeypatch.setattr(limiter, "limit", limiter.limit)
+    url = f"{URL}/health/admission/login"
+
+    assert client.put(url, json={"limit": 3}).status_code == 403
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+    response = client.put(url, json={"limit": 3}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["limit"] == 3
+    assert client.get(f"{URL}/health/admission").json()["login"]["limit"] == 3
+
+
+def test_export_holds_slot_while_streaming(
+    client: TestClient, logged_user: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a streamed export keeps its slot until the body is sent."""
+    limiter = limiters["database"]
+    in_flight = limiter.in_flight
+    seen = []
+
+    def stream_export(*args, **kwargs):
+        seen.append(limiter.in_flight)
+        yield b"receipt_id\n"
+        seen.append(limiter.in_flight)
+
+    monkeypatch.setattr(receipt, "stream_export", stream_export)
+    response = client.get(f"{URL}/receipts/export", headers=logged_user)
+    assert response.status_code == 200
+    assert seen == [in_flight + 1, in_flight + 1]
+    assert limiter.in_flight == in_flight
+
+
+def test_logins_queue_behind_receipts(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that logins also need a database slot, at the lowest priority."""
+    limiter = limiters["database"]
+    monkeypatch.setattr(limiter, "limit", 1)
+    monkeypatch.setattr(limiter, "queue_size", 0)
+    monkeypatch.setattr(limiter, "in_flight", 1)
+
+    response = client.post(
+        f"{URL}/token",
+        data={"username": settings.FIRST_LOGIN, "password": settings.FIRST_PASSWORD},
+    )
+    assert response.status_code == 503
+    assert limiters["login"].in_flight == 0
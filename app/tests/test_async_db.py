@@ -0,0 +1,59 @@
+from collections.abc import Generator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.dependencies import get_async_db, get_session
+from app.main import app
+from app.tests.utils.utils import get_token_headers
+
+
+@pytest.fixture(scope="module")
+def async_client() -> Generator[TestClient, None, None]:
+    """Client whose endpoints use the asynchronous database path."""
+    app.dependency_overrides[get_session] = get_async_db
+    try:
+        with TestClient(app) as c:
+            yield c
+    finally:
+        app.dependency_overrides.pop(get_session, None)
+
+
+def test_create_and_read_receipt(async_client: TestClient) -> None:
+    """Test creating and reading back a receipt through the async session."""
+    headers = get_token_headers(async_client)
+    data = {
+        "user_id": 2,
+        "sale_items": [{"product_id": 2, "quantity": 1}],
+        "payment_type": "card",
+        "payment_amount": 620000,
+    }
+    response = async_client.post(
+        f"http://{settings.DOMAIN}:8000/receipts/", headers=headers, json=data
+    )
+    assert response.status_code == 200
+    receipt_id = response.json()["id"]
+
+    response = async_client.get(
+        f"http://{settings.DOMAIN}:8000/receipts/{receipt_id}/", headers=headers
+    )
+    assert response.status_code == 200
+    assert len(response.json()["sale_items"]) == 1
+
+    response = async_client.get(
+        f"http://{settings.DOMAIN}:8000/receipts/", headers=headers
+    )
+    assert response.status_code == 200
+    assert all(receipt["user_id"] == 2 for receipt in response.json())
+
+
+def test_public_receipt_and_text(async_client: TestClient) -> None:
+    """Test the public receipt endpoints through the async session."""
+    response = async_client.get(f"http://{settings.DOMAIN}:8000/receipts/public/6")
+    assert response.status_code == 200
+    assert len(response.json()["sale_items"]) == 2
+
+    response = async_client.get(f"http://{settings.DOMAIN}:8000/receipts/6/text")
+    assert response.status_code == 200
+    assert "Чек №6" in response.text
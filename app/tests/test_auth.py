@@ -1,6 +1,8 @@
 from fastapi.testclient import TestClient
 
+from app.cache import principal_cache
 from app.core.config import settings
+from app.models import User
 
 
 def test_get_access_token(client: TestClient) -> None:
@@ -35,3 +37,41 @@ def test_no_get_access_token_incorrect_password(client: TestClient) -> None:
     }
     r = client.post(f"http://{settings.DOMAIN}:8000/token", data=login_data)
     assert r.status_code == 401
+
+
+def test_repeated_token_served_from_principal_cache(
+    client: TestClient, logged_user: dict[str, str]
+) -> None:
+    """
+    Test that a token seen before is served from the principal cache
+    :param client:
+    :param logged_user:
+    :return:
+    """
+
+    url = f"http://{settings.DOMAIN}:8000/receipts/"
+    assert client.get(url, headers=logged_user).status_code == 200
+    hits = principal_cache.stats().hits
+
+    r = client.get(url, headers=logged_user)
+    assert r.status_code == 200
+    assert principal_cache.stats().hits == hits + 1
+
+    stats = client.get(f"http://{settings.DOMAIN}:8000/health/cache").json()
+    assert stats["principals"]["hits"] == hits + 1
+
+
+def test_principal_cache_revoked_when_user_changes(db_test) -> None:
+    """
+    Test that changing a user forgets the tokens cached for them
+    :param db_test:
+    :return:
+    """
+
+    user = db_test.query(User).filter(User.username == settings.FIRST_LOGIN).one()
+    principal_cache.set("token", user, expires_at=None)
+    assert principal_cache.get(db_test, "token").id == user.id
+
+    user.name = f"{user.name} "
+    db_test.commit()
+    assert principal_cache.get(db_test, "token") is None
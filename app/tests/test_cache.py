@@ -0,0 +1,92 @@
+from sqlalchemy import select
+
+from app.cache import PrincipalCache, ProductCache, TTLCache, product_cache
+from app.models import Product, User
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_evicts_least_recently_used() -> None:
+    """Test that a full cache drops the least recently used entry."""
+
+    cache: TTLCache[int, str] = TTLCache(maxsize=2)
+    cache.set(1, "one")
+    cache.set(2, "two")
+    assert cache.get(1) == "one"
+    cache.set(3, "three")
+
+    assert cache.get(2) is None
+    assert cache.get(1) == "one"
+    assert cache.get(3) == "three"
+    assert cache.stats().hits == 3
+    assert cache.stats().misses == 1
+
+
+def test_ttl_cache_expires_entries() -> None:
+    """Test that entries expire after the cache TTL or their own TTL."""
+
+    timer = FakeTimer()
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=60, timer=timer)
+    cache.set("default", 1)
+    cache.set("short", 2, ttl=5)
+
+    timer.now = 10
+    assert cache.get("short") is None
+    assert cache.get("default") == 1
+
+    timer.now = 61
+    assert cache.get("default") is None
+    assert len(cache) == 0
+
+
+def test_product_cache_get_many(db_test) -> None:
+    """Test that misses are loaded in one go and then served from the cache."""
+
+    cache = ProductCache(maxsize=100)
+    product_ids = list(db_test.scalars(select(Product.id).limit(2)))
+
+    products = cache.get_many(db_test, [*product_ids, -1])
+    assert set(products) == set(product_ids)
+    assert cache.stats().misses == len(product_ids) + 1
+
+    assert cache.get_many(db_test, product_ids) == products
+    assert cache.stats().hits == len(product_ids)
+
+
+def test_product_cache_invalidated_on_commit(db_test) -> None:
+    """Test that changing a product through the ORM invalidates its cache entry."""
+
+    product = db_test.scalars(select(Product).limit(1)).one()
+    product_cache.get_many(db_test, [product.id])
+
+    product.price += 1
+    db_test.commit()
+
+    try:
+        cached = product_cache.get_many(db_test, [product.id])[product.id]
+        assert cached.price == product.price
+    finally:
+        # The price change is rolled back with the test transaction
+        product_cache.clear()
+
+
+def test_principal_cache_bounded_by_token_expiry(db_test) -> None:
+    """Test that a cached token does not outlive its exp claim."""
+
+    timer = FakeTimer()
+    cache = PrincipalCache(maxsize=10, ttl=300, timer=timer, clock=timer)
+    user = db_test.scalars(select(User).limit(1)).one()
+
+    cache.set("expired", user, expires_at=-1)
+    cache.set("valid", user, expires_at=30)
+    assert cache.get(db_test, "expired") is None
+    assert cache.get(db_test, "valid").id == user.id
+
+    timer.now = 31
+    assert cache.get(db_test, "valid") is None
@@ -1,5 +1,6 @@
 import app.crud as crud
-from app.schemas import UserCreate
+from app.core.config import settings
+from app.schemas import ReceiptCreate, SaleItemCreate, UserCreate
 
 
 def test_create_user(db_test) -> None:
@@ -31,3 +32,30 @@ def test_get_receipt_by_user_and_id(db_test) -> None:
 
     assert fetched_receipt.id == 6
     assert fetched_receipt.user_id == 2
+
+
+def test_create_receipt(db_test) -> None:
+    """Test create_receipt function.
+
+    Products are resolved in bulk, unknown products are skipped
+    and the receipt is written with its final total and change."""
+
+    user = crud.get_user_by_username(db_test, settings.FIRST_LOGIN)
+    receipt_data = ReceiptCreate(
+        user_id=user.id,
+        sale_items=[
+            SaleItemCreate(product_id=2, quantity=2),
+            SaleItemCreate(product_id=2, quantity=1),
+            SaleItemCreate(product_id=-1, quantity=1),
+        ],
+        payment_type="cash",
+        payment_amount=2000000,
+    )
+    receipt = crud.create_receipt(db_test, receipt_data, user)
+
+    assert receipt.id is not None
+    assert receipt.created_at is not None
+    assert receipt.user_id == user.id
+    assert len(receipt.sale_items) == 2
+    assert receipt.total == sum(item.total_price for item in receipt.sale_items)
+    assert receipt.change_given == receipt.payment_amount - receipt.total
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.config import settings
+from app.database import create_db_engine, get_pool_limits, get_pool_stats
+
+
+def test_engine_uses_pool_settings() -> None:
+    """Test that the engine factory applies the pool settings."""
+
+    engine = create_db_engine(pool_size=2, max_overflow=1)
+    try:
+        assert engine.pool.size() == 2
+        assert engine.pool._max_overflow == 1
+        assert engine.pool._recycle == settings.DB_POOL_RECYCLE
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.parametrize(
+    ("budget", "workers", "limits"),
+    [(None, 8, (5, 10)), (200, 4, (5, 10)), (80, 4, (5, 5)), (24, 4, (3, 0))],
+)
+def test_pool_limits_share_connection_budget(
+    budget: int | None, workers: int, limits: tuple[int, int]
+) -> None:
+    """Test that the engines of all workers split the connection budget."""
+
+    config = settings.model_copy(
+        update={
+            "DB_POOL_SIZE": 5,
+            "DB_MAX_OVERFLOW": 10,
+            "DB_CONNECTION_BUDGET": budget,
+            "WEB_CONCURRENCY": workers,
+        }
+    )
+    assert get_pool_limits(config) == limits
+
+
+def test_forked_worker_gets_its_own_pool() -> None:
+    """Test that a forked child does not reuse its parent's connections."""
+
+    from app.database import engine
+
+    with engine.connect() as connection:
+        parent_pid = connection.exec_driver_sql("SELECT pg_backend_pid()").scalar()
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            with engine.connect() as connection:
+                child_pid = connection.exec_driver_sql(
+                    "SELECT pg_backend_pid()"
+                ).scalar()
+            os.write(write_end, str(child_pid).encode())
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    os.close(write_end)
+    child_pid = int(os.read(read_end, 32))
+    os.close(read_end)
+    assert child_pid != parent_pid
+
+
+def test_pool_stats_track_checkouts_and_timeouts() -> None:
+    """Test that pool stats report checked out connections and timeouts."""
+
+    engine = create_db_engine(pool_size=1, max_overflow=0, pool_timeout=0.1)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            stats = get_pool_stats(engine.pool)
+            assert stats.checked_out == 1
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+
+        stats = get_pool_stats(engine.pool)
+        assert stats.checked_out == 0
+        assert stats.checkouts == 2
+        assert stats.timeouts == 1
+        assert stats.wait_seconds_max >= 0.1
+    finally:
+        engine.dispose()
+
+
+def test_get_pool_usage(client: TestClient) -> None:
+    """Test that live pool stats are exposed."""
+
+    response = client.get(f"http://{settings.DOMAIN}:8000/health/pool")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["sync"]["size"] == settings.DB_POOL_SIZE
+    assert "wait_seconds_total" in stats["async"]
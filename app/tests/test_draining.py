@@ -0,0 +1,48 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.draining import InFlight, receipt_writes
+
+
+def test_drain_waits_for_work_in_flight() -> None:
+    """Test that draining waits for tracked work and refuses new work."""
+
+    async def scenario() -> tuple[bool, bool, bool]:
+        tracker = InFlight()
+
+        async def work() -> None:
+            async with tracker.track():
+                await asyncio.sleep(0.1)
+
+        task = asyncio.create_task(work())
+        await asyncio.sleep(0)
+        unfinished = await tracker.drain(timeout=0.01, interval=0.01)
+        finished = await tracker.drain(timeout=1, interval=0.01)
+        await task
+        return unfinished, finished, tracker.accepting
+
+    assert asyncio.run(scenario()) == (False, True, False)
+
+
+def test_receipt_writes_refused_while_draining(
+    client: TestClient, logged_user: dict[str, str]
+) -> None:
+    """Test that a draining worker sends new receipts elsewhere."""
+
+    data = {
+        "user_id": 2,
+        "sale_items": [{"product_id": 2, "quantity": 1}],
+        "payment_type": "card",
+        "payment_amount": 620000,
+    }
+    receipt_writes.accepting = False
+    try:
+        response = client.post(
+            f"http://{settings.DOMAIN}:8000/receipts/", headers=logged_user, json=data
+        )
+    finally:
+        receipt_writes.open()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
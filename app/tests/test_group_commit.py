@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from collections.abc import Generator
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import crud, group_commit
+from app.core.config import settings
+from app.dependencies import SessionLocal
+from app.group_commit import GroupCommitWriter, receipt_group_writer
+from app.main import app
+from app.models import User
+from app.schemas import ReceiptCreate, SaleItemCreate
+
+RECEIPT = {
+    "user_id": 2,
+    "sale_items": [{"product_id": 2, "quantity": 1}],
+    "payment_type": "card",
+    "payment_amount": 620000,
+}
+
+
+@pytest.fixture(scope="module")
+def client() -> Generator[TestClient, None, None]:
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(settings, "RECEIPT_GROUP_COMMIT", True)
+        # A wide window, so that requests sent together always share a group
+        monkeypatch.setattr(receipt_group_writer, "window", 0.2)
+        with TestClient(app) as c:
+            yield c
+    assert not receipt_group_writer.running
+
+
+def test_concurrent_receipts_share_a_commit(
+    client: TestClient, logged_user: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that concurrent requests are stored in one group, each getting its own receipt."""
+    write_group = group_commit.write_group
+    groups = []
+
+    def recording_write_group(db, receipts):
+        groups.append(len(receipts))
+        return write_group(db, receipts)
+
+    monkeypatch.setattr(group_commit, "write_group", recording_write_group)
+    responses = []
+
+    def post(amount: int) -> None:
+        responses.append(
+            client.post(
+                f"http://{settings.DOMAIN}:8000/receipts/",
+                headers=logged_user,
+                json={**RECEIPT, "payment_amount": amount},
+            )
+        )
+
+    threads = [threading.Thread(target=post, args=(620000 + i,)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [200] * 5
+    receipts = [response.json() for response in responses]
+    assert len({receipt["id"] for receipt in receipts}) == 5
+    for receipt in receipts:
+        assert receipt["change_given"] == receipt["payment_amount"] - receipt["total"]
+    assert sum(groups) == 5
+    assert max(groups) > 1
+
+
+def test_failed_group_is_retried_receipt_by_receipt(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Test that one bad receipt fails alone and the rest of its group is stored."""
+    create_receipts_for_users = crud.create_receipts_for_users
+
+    def failing_create_receipts_for_users(db, receipts, commit=True):
+        if any(receipt.payment_type == "bad" for _, receipt in receipts):
+            raise SQLAlchemyError("bad receipt")
+        return create_receipts_for_users(db, receipts, commit=commit)
+
+    monkeypatch.setattr(
+        crud, "create_receipts_for_users", failing_create_receipts_for_users
+    )
+    receipts = [
+        ReceiptCreate(
+            user_id=2,
+            sale_items=[SaleItemCreate(product_id=2, quantity=1)],
+            payment_type=payment_type,
+            payment_amount=620000,
+        )
+        for payment_type in ("card", "bad", "cash")
+    ]
+
+    with SessionLocal() as db:
+        results = group_commit.write_group(db, [(2, receipt) for receipt in receipts])
+
+    assert isinstance(results[1], SQLAlchemyError)
+    assert [results[0].payment_type, results[2].payment_type] == ["card", "cash"]
+    with SessionLocal() as db:
+        assert crud.get_receipt_by_id(db, results[2].id) is not None
+
+
+def test_writer_refuses_receipts_until_started() -> None:
+    """Test that a writer that was never started fails instead of hanging."""
+    writer = GroupCommitWriter(window=0.01, max_size=10)
+    receipt = ReceiptCreate(
+        user_id=2,
+        sale_items=[SaleItemCreate(product_id=2, quantity=1)],
+        payment_type="card",
+        payment_amount=620000,
+    )
+
+    async def scenario() -> None:
+        await writer.stop()
+        with pytest.raises(RuntimeError, match="not running"):
+            await writer.create_receipt(receipt, User(id=2))
+
+    asyncio.run(scenario())
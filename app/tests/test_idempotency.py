@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app import crud, idempotency
+from app.core.config import settings
+from app.dependencies import SessionLocal
+from app.models import IdempotencyKey
+from app.schemas import ReceiptCreate, SaleItemCreate
+
+RECEIPT = {
+    "user_id": 2,
+    "sale_items": [{"product_id": 2, "quantity": 1}],
+    "payment_type": "card",
+    "payment_amount": 620000,
+}
+
+
+def test_retry_replays_stored_response(
+    client: TestClient, logged_user: dict[str, str]
+) -> None:
+    """Test that a retried request returns the first response unchanged."""
+    url = f"http://{settings.DOMAIN}:8000/receipts/"
+    headers = {**logged_user, "Idempotency-Key": str(uuid.uuid4())}
+
+    first = client.post(url, headers=headers, json=RECEIPT)
+    assert first.status_code == 200
+    assert idempotency.REPLAYED_HEADER not in first.headers
+
+    retry = client.post(url, headers=headers, json=RECEIPT)
+    assert retry.status_code == 200
+    assert retry.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert retry.json() == first.json()
+
+    other = client.post(url, headers=headers, json={**RECEIPT, "payment_type": "cash"})
+    assert other.status_code == 422
+
+
+def test_concurrent_duplicates_create_one_receipt(monkeypatch) -> None:
+    """Test that a duplicate waits for the request in flight and replays it."""
+    create_receipts = crud.create_receipts
+
+    def slow_create_receipts(*args, **kwargs):
+        time.sleep(0.2)
+        return create_receipts(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "create_receipts", slow_create_receipts)
+    receipt = ReceiptCreate(
+        user_id=2,
+        sale_items=[SaleItemCreate(product_id=2, quantity=1)],
+        payment_type="card",
+        payment_amount=620000,
+    )
+    key = str(uuid.uuid4())
+    results = []
+
+    def post() -> None:
+        with SessionLocal() as db:
+            user = crud.get_user_by_username(db, settings.FIRST_LOGIN)
+            results.append(idempotency.create_receipt(db, receipt, user, key))
+
+    threads = [threading.Thread(target=post) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(result.replayed for result in results) == [False, True]
+    assert len({json.loads(result.body)["id"] for result in results}) == 1
+
+
+def test_purge_expired_keys(db_test) -> None:
+    """Test that only expired keys are purged."""
+    now = datetime.now(timezone.utc)
+    db_test.add_all(
+        [
+            IdempotencyKey(
+                user_id=2, key="expired", request_hash="", expires_at=now - timedelta(1)
+            ),
+            IdempotencyKey(
+                user_id=2, key="current", request_hash="", expires_at=now + timedelta(1)
+            ),
+        ]
+    )
+    db_test.flush()
+
+    assert idempotency.purge_expired(db_test, batch_size=1) >= 1
+    assert db_test.get(IdempotencyKey, (2, "expired")) is None
+    assert db_test.get(IdempotencyKey, (2, "current")) is not None
@@ -0,0 +1,46 @@
+import logging
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+
+URL = f"http://{settings.DOMAIN}:8000"
+ROUTE = 'method="GET",route="/receipts/public/{receipt_id}"'
+
+
+def scrape(client: TestClient, sample: str) -> float:
+    response = client.get(f"{URL}/metrics")
+    assert response.status_code == 200
+    match = re.search(rf"^{re.escape(sample)} (\S+)$", response.text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_metrics_count_sql_per_route(client: TestClient) -> None:
+    """Test that requests are recorded under their route template."""
+
+    statements = f"http_request_sql_statements_sum{{{ROUTE}}}"
+    requests = f'http_requests_total{{{ROUTE},status="200"}}'
+    before = scrape(client, statements), scrape(client, requests)
+    for receipt_id in (2, 6):
+        assert client.get(f"{URL}/receipts/public/{receipt_id}").status_code == 200
+    after = scrape(client, statements), scrape(client, requests)
+
+    assert after[0] - before[0] == 2
+    assert after[1] - before[1] == 2
+    assert scrape(client, f"http_request_db_rows_count{{{ROUTE}}}") >= 2
+
+
+def test_slow_requests_are_logged(
+    client: TestClient, caplog: pytest.LogCaptureFixture, monkeypatch
+) -> None:
+    """Test that slow requests are logged with their statements."""
+
+    monkeypatch.setattr(settings, "SLOW_REQUEST_SECONDS", 0)
+    with caplog.at_level(logging.WARNING, logger="uvicorn.error"):
+        client.get(f"{URL}/receipts/public/6")
+    message = next(r.message for r in caplog.records if "Slow request" in r.message)
+    assert "GET /receipts/public/{receipt_id}" in message
+    assert "1 statements" in message
+    assert "SELECT" in message
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import Connection, text
+
+from app.models import SCHEMA_VERSION
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+@pytest.fixture(scope="module")
+def migrated(engine) -> None:
+    command.upgrade(Config(str(ALEMBIC_INI)), "head")
+
+
+def explain(connection: Connection, sql: str, **params: object) -> str:
+    # The test tables are tiny, so steer the planner to the ordered index scans
+    # it would choose on production-sized tables
+    for setting in ("enable_seqscan", "enable_bitmapscan", "enable_sort"):
+        connection.execute(text(f"SET LOCAL {setting} = off"))
+    rows = connection.execute(text(f"EXPLAIN {sql}"), params)
+    return "\n".join(row[0] for row in rows)
+
+
+@pytest.mark.parametrize(
+    ("sql", "index"),
+    [
+        (
+            "SELECT id, created_at FROM receipts WHERE user_id = :id"
+            " ORDER BY created_at, id LIMIT 10",
+            "ix_receipts_user_id_created_at_id",
+        ),
+        (
+            "SELECT id FROM receipts WHERE user_id = :id"
+            " AND payment_type = 'cash' ORDER BY created_at, id LIMIT 10",
+            "ix_receipts_user_id_payment_type_created_at_id",
+        ),
+        (
+            "SELECT product_id, quantity FROM sale_items WHERE receipt_id = :id",
+            "ix_sale_items_receipt_id",
+        ),
+        (
+            "SELECT id FROM receipt_items WHERE receipt_id = :id",
+            "ix_receipt_items_receipt_id",
+        ),
+    ],
+)
+def test_hot_queries_use_indexes(migrated, engine, sql: str, index: str) -> None:
+    """Test that the receipt queries are served by the migrated indexes."""
+
+    with engine.begin() as connection:
+        plan = explain(connection, sql, id=1)
+    assert index in plan, plan
+
+
+def test_upgrade_is_idempotent(migrated, engine) -> None:
+    """Test that running the migrations again is a no-op."""
+
+    config = Config(str(ALEMBIC_INI))
+    command.upgrade(config, "head")
+    with engine.connect() as connection:
+        version = connection.execute(text("SELECT version_num FROM alembic_version"))
+        assert (
+            version.scalar_one()
+            == ScriptDirectory.from_config(config).get_current_head()
+        )
+
+
+def test_schema_version_is_head() -> None:
+    """Test that the version checked at startup is the latest migration."""
+
+    config = Config(str(ALEMBIC_INI))
+    assert SCHEMA_VERSION == ScriptDirectory.from_config(config).get_current_head()
@@ -0,0 +1,155 @@
+"""SQL statement budgets of the API endpoints.
+
+Each endpoint declares the most statements one request may run. The
+budgets are checked for several basket and page sizes, so an N+1 query
+(a lazy load per item or per receipt) fails here however small the
+test data is. Raise a budget only together with the change that needs it.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cache import product_cache, receipt_text_cache
+from app.core.config import settings
+from app.tests.utils.queries import assert_query_budget
+
+URL = f"http://{settings.DOMAIN}:8000"
+
+QUERY_BUDGETS = {
+    # Products (on a cache miss), receipts, sale items and the two rollups
+    "POST /receipts/": 5,
+    "POST /receipts/batch": 5,
+    # Receipts, then their sale items with one SELECT ... IN
+    "GET /receipts/": 2,
+    "GET /receipts/{receipt_id}/": 1,
+    "GET /receipts/public/{receipt_id}": 1,
+    # The receipt with its items; texts print the stored product names, so
+    # the cleared product cache must not add a query
+    "GET /receipts/{receipt_id}/text": 1,
+    # Receipts, then their sale items
+    "GET /receipts/text": 2,
+    "GET /receipts/export": 1,
+    # Totals, then periods when a granularity is given
+    "GET /receipts/summary": 2,
+    "POST /token": 1,
+}
+
+BASKET_SIZES = [1, 10, 50]
+PAGE_SIZES = [1, 10, 100]
+
+
+def basket(size: int) -> dict[str, object]:
+    return {
+        "user_id": 2,
+        "sale_items": [
+            {"product_id": index % 3 + 1, "quantity": 1} for index in range(size)
+        ],
+        "payment_type": "card",
+        "payment_amount": 100_000_000,
+    }
+
+
+@pytest.fixture(scope="module")
+def headers(client: TestClient, logged_user: dict[str, str]) -> dict[str, str]:
+    # Authenticate once, so the user lookup does not count against the budgets
+    client.get(f"{URL}/receipts/?limit=1", headers=logged_user)
+    return logged_user
+
+
+@pytest.mark.parametrize("size", BASKET_SIZES)
+def test_receipt_write_and_reads_within_budget(
+    client: TestClient, headers: dict[str, str], size: int
+) -> None:
+    """Test that writing and reading a receipt costs the same for any basket."""
+
+    product_cache.clear()
+    route = "POST /receipts/"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        response = client.post(f"{URL}/receipts/", json=basket(size), headers=headers)
+    assert response.status_code == 200
+    receipt_id = response.json()["id"]
+
+    route = "GET /receipts/{receipt_id}/"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        response = client.get(f"{URL}/receipts/{receipt_id}/", headers=headers)
+    assert len(response.json()["sale_items"]) == size
+
+    route = "GET /receipts/public/{receipt_id}"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        assert client.get(f"{URL}/receipts/public/{receipt_id}").status_code == 200
+
+    product_cache.clear()
+    receipt_text_cache.clear()
+    route = "GET /receipts/{receipt_id}/text"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        assert client.get(f"{URL}/receipts/{receipt_id}/text").status_code == 200
+
+
+@pytest.mark.parametrize("size", BASKET_SIZES)
+def test_receipt_batch_within_budget(
+    client: TestClient, headers: dict[str, str], size: int
+) -> None:
+    """Test that a batch within one chunk costs the same however many receipts."""
+
+    product_cache.clear()
+    route = "POST /receipts/batch"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        response = client.post(
+            f"{URL}/receipts/batch",
+            json=[basket(3) for _ in range(size)],
+            headers=headers,
+        )
+    assert [result["error"] for result in response.json()] == [None] * size
+
+
+@pytest.mark.parametrize("limit", PAGE_SIZES)
+def test_receipt_listings_within_budget(
+    client: TestClient, headers: dict[str, str], limit: int
+) -> None:
+    """Test that listing, printing and exporting cost the same for any page."""
+
+    route = "GET /receipts/"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        response = client.get(f"{URL}/receipts/?limit={limit}", headers=headers)
+    assert len(response.json()) == limit
+
+    product_cache.clear()
+    route = "GET /receipts/text"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        response = client.get(f"{URL}/receipts/text?limit={limit}", headers=headers)
+    assert response.status_code == 200
+
+    route = "GET /receipts/export"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        response = client.get(f"{URL}/receipts/export", headers=headers)
+    assert response.status_code == 200
+
+
+def test_summary_and_login_within_budget(
+    client: TestClient, headers: dict[str, str]
+) -> None:
+    """Test the budgets of the sales summary and of logging in."""
+
+    route = "GET /receipts/summary"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        response = client.get(
+            f"{URL}/receipts/summary",
+            params={
+                "date_from": "2000-01-01T00:00:00Z",
+                "date_to": "2100-01-01T00:00:00Z",
+                "granularity": "day",
+            },
+            headers=headers,
+        )
+    assert response.status_code == 200
+
+    route = "POST /token"
+    with assert_query_budget(QUERY_BUDGETS[route], route):
+        response = client.post(
+            f"{URL}/token",
+            data={
+                "username": settings.FIRST_LOGIN,
+                "password": settings.FIRST_PASSWORD,
+            },
+        )
+    assert response.status_code == 200
@@ -1,6 +1,15 @@
+import csv
+import gzip
+import io
+import json
+
 from starlette.testclient import TestClient
 
+from app.cache import receipt_text_cache
 from app.core.config import settings
+from app.dependencies import SessionLocal
+from app.models import Product
+from app.tests.utils.queries import assert_query_budget
 
 
 def test_create_receipt(client: TestClient, logged_user: dict[str, str]) -> None:
@@ -90,6 +99,125 @@ def test_get_receipt_text(client: TestClient, logged_user: dict[str, str]) -> No
     assert expected_end in response.text
 
 
+def test_get_receipt_text_width(client: TestClient) -> None:
+    """Test that each width is rendered and cached separately."""
+    url = f"http://{settings.DOMAIN}:8000/receipts/2/text"
+    narrow = client.get(url).json()
+    wide = client.get(f"{url}?width=60").json()
+    assert narrow.splitlines()[1] == "=" * 40
+    assert wide.splitlines()[1] == "=" * 60
+    assert client.get(url).json() == narrow
+    assert client.get(f"{url}?width=10").status_code == 422
+
+
+def test_receipt_text_ignores_later_product_changes(
+    client: TestClient, logged_user: dict[str, str]
+) -> None:
+    """Test that a receipt prints what was sold, not the current product."""
+    data = {
+        "user_id": 2,
+        "sale_items": [{"product_id": 2, "quantity": 2}],
+        "payment_type": "card",
+        "payment_amount": 2_000_000,
+    }
+    url = f"http://{settings.DOMAIN}:8000/receipts"
+    receipt = client.post(f"{url}/", headers=logged_user, json=data).json()
+    response = client.get(f"{url}/{receipt['id']}/text")
+    text, etag = response.json(), response.headers["etag"]
+
+    with SessionLocal() as db:
+        product = db.get(Product, 2)
+        name, price = product.name, product.price
+        product.name, product.price = "Renamed", price * 2
+        db.commit()
+        try:
+            receipt_text_cache.clear()
+            response = client.get(f"{url}/{receipt['id']}/text")
+            assert response.json() == text
+            # The ETag was sent as immutable, so the body behind it must not change
+            assert response.headers["etag"] == etag
+        finally:
+            product.name, product.price = name, price
+            db.commit()
+    assert f"{receipt['total']:,.2f}".replace(",", " ") in text
+    assert name in text
+
+
+def test_print_receipts(client: TestClient, logged_user: dict[str, str]) -> None:
+    """Test printing many receipts as one streamed text.
+
+    Each receipt is printed exactly as the single receipt text endpoint does."""
+    url = f"http://{settings.DOMAIN}:8000/receipts"
+    receipts = client.get(f"{url}/?limit=3", headers=logged_user).json()
+    response = client.get(f"{url}/text?limit=3", headers=logged_user)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; charset=utf-8"
+
+    texts = response.text.split("\n\n")
+    assert texts.pop() == ""
+    assert len(texts) == len(receipts)
+    for receipt, text in zip(receipts, texts, strict=True):
+        assert text == client.get(f"{url}/{receipt['id']}/text").json()
+
+    response = client.get(f"{url}/text?locale=xx", headers=logged_user)
+    assert response.status_code == 400
+
+
+def test_get_sales_summary(client: TestClient, logged_user: dict[str, str]) -> None:
+    """Test that the sales summary counts a newly created receipt."""
+    url = f"http://{settings.DOMAIN}:8000/receipts"
+    params = {"date_from": "2000-01-01T00:00:00Z", "date_to": "2100-01-01T00:00:00Z"}
+    before = client.get(f"{url}/summary", params=params, headers=logged_user).json()
+    client.post(
+        f"{url}/",
+        json={
+            "user_id": 2,
+            "sale_items": [{"product_id": 1, "quantity": 1}],
+            "payment_type": "cash",
+            "payment_amount": 3000000,
+        },
+        headers=logged_user,
+    )
+    response = client.get(
+        f"{url}/summary", params={**params, "granularity": "day"}, headers=logged_user
+    )
+    assert response.status_code == 200
+    after = response.json()
+    assert after["receipts"] == before["receipts"] + 1
+    assert after["periods"] is not None
+    assert sum(period["receipts"] for period in after["periods"]) == after["receipts"]
+
+
+def test_export_receipts(client: TestClient, logged_user: dict[str, str]) -> None:
+    """Test exporting receipts as CSV, NDJSON and gzip, one row per sale item."""
+    url = f"http://{settings.DOMAIN}:8000/receipts/export"
+    params = {"payment_type": "cash", "min_total": 1000}
+    response = client.get(url, params=params, headers=logged_user)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert rows
+    assert {row["payment_type"] for row in rows} == {"cash"}
+    assert "product_name" in rows[0]
+
+    response = client.get(
+        url, params={**params, "format": "ndjson"}, headers=logged_user
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["receipt_id"] for line in lines] == [
+        int(row["receipt_id"]) for row in rows
+    ]
+
+    response = client.get(
+        url, params={**params, "format": "ndjson", "gzip": True}, headers=logged_user
+    )
+    assert response.headers["content-type"] == "application/gzip"
+    assert "receipts.ndjson.gz" in response.headers["content-disposition"]
+    assert [
+        json.loads(line) for line in gzip.decompress(response.content).splitlines()
+    ] == lines
+
+
 def test_can_get_receipt_text_for_other_user(client: TestClient) -> None:
     """Test that a user can get a receipt text for another user's receipt.
 
@@ -124,3 +252,126 @@ def test_get_public_receipt(client: TestClient) -> None:
     assert receipt["payment_type"] == "cash"
     assert receipt["total"] == 1516610
     assert len(receipt["sale_items"]) == 2
+
+
+def test_public_receipt_conditional_get(client: TestClient) -> None:
+    """Test that a matching ETag gets a 304 without any database query."""
+    url = f"http://{settings.DOMAIN}:8000/receipts"
+    for path in ("public/6", "6/text"):
+        response = client.get(f"{url}/{path}")
+        assert response.status_code == 200
+        assert "immutable" in response.headers["cache-control"]
+        etag = response.headers["etag"]
+
+        with assert_query_budget(0, f"Revalidating {path}"):
+            response = client.get(
+                f"{url}/{path}", headers={"If-None-Match": f'"other", {etag}'}
+            )
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+
+    narrow = client.get(f"{url}/6/text").headers["etag"]
+    assert client.get(f"{url}/6/text?width=60").headers["etag"] != narrow
+    assert "etag" not in client.get(f"{url}/public/999999").headers
+    response = client.get(f"{url}/public/999999", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+
+
+def test_create_receipts_batch(client: TestClient, logged_user: dict[str, str]) -> None:
+    """Test creating receipts from a streamed NDJSON body.
+
+    Results come back in body order, and an invalid line
+    gets its own error without failing the other receipts."""
+    receipt = {
+        "user_id": 2,
+        "sale_items": [{"product_id": 2, "quantity": 1}],
+        "payment_type": "card",
+        "payment_amount": 620000,
+    }
+    lines = [json.dumps(receipt), "{not json", json.dumps({"user_id": 2})]
+    lines.append(json.dumps({**receipt, "payment_type": "cash"}))
+    response = client.post(
+        f"http://{settings.DOMAIN}:8000/receipts/batch",
+        headers={**logged_user, "Content-Type": "application/x-ndjson"},
+        content="\n".join(lines),
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert results[0]["receipt"]["payment_type"] == "card"
+    assert results[1]["error"]
+    assert results[2]["error"]
+    assert results[3]["receipt"]["payment_type"] == "cash"
+    assert results[3]["receipt"]["id"] > results[0]["receipt"]["id"]
+
+
+def test_create_receipts_batch_json_array(
+    client: TestClient, logged_user: dict[str, str]
+) -> None:
+    """Test creating receipts from a JSON array body."""
+    receipt = {
+        "user_id": 2,
+        "sale_items": [{"product_id": 2, "quantity": 2}],
+        "payment_type": "cash",
+        "payment_amount": 1240000,
+    }
+    response = client.post(
+        f"http://{settings.DOMAIN}:8000/receipts/batch",
+        headers=logged_user,
+        json=[receipt, receipt],
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert len(results) == 2
+    assert all(result["receipt"]["change_given"] == 0 for result in results)
+
+
+def test_get_receipts_with_cursor(
+    client: TestClient, logged_user: dict[str, str]
+) -> None:
+    """Test paging through receipts with the next page cursor.
+
+    Cursor pages follow each other without gaps or overlaps,
+    in the same order as offset pages."""
+    url = f"http://{settings.DOMAIN}:8000/receipts/"
+    # Other tests keep adding receipts, so compare a fixed-size prefix
+    everything = client.get(url, headers=logged_user, params={"limit": 21}).json()
+
+    seen = []
+    params: dict[str, str | int] = {"limit": 2}
+    while len(seen) < len(everything):
+        response = client.get(url, headers=logged_user, params=params)
+        assert response.status_code == 200
+        seen.extend(receipt["id"] for receipt in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert seen[: len(everything)] == [receipt["id"] for receipt in everything]
+
+
+def test_get_receipts_with_invalid_cursor(
+    client: TestClient, logged_user: dict[str, str]
+) -> None:
+    """Test that a malformed cursor is rejected."""
+    response = client.get(
+        f"http://{settings.DOMAIN}:8000/receipts/",
+        headers=logged_user,
+        params={"cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+
+
+def test_get_receipts_with_zero_limit(
+    client: TestClient, logged_user: dict[str, str]
+) -> None:
+    """Test that an empty page is returned without a next page cursor."""
+    response = client.get(
+        f"http://{settings.DOMAIN}:8000/receipts/",
+        headers=logged_user,
+        params={"limit": 0},
+    )
+    assert response.status_code == 200
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
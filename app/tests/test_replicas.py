@@ -0,0 +1,152 @@
+import time
+from collections.abc import Generator
+
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+from app import crud
+from app.cache import principal_cache
+from app.core.config import settings
+from app.database import create_async_db_engine, create_db_engine, get_pool_stats
+from app.dependencies import SessionLocal
+from app.models import User
+from app.replicas import LAST_WRITE_COOKIE, Replica, replica_set
+from app.security import password_hasher
+from app.tests.utils.queries import QueryCounter
+
+
+def use_replica(
+    monkeypatch: pytest.MonkeyPatch, port: int = settings.POSTGRES_PORT
+) -> Replica:
+    # The test database stands in for a replica, through engines of its own
+    url = str(settings.SQLALCHEMY_DATABASE_URI).replace(
+        f":{settings.POSTGRES_PORT}/", f":{port}/"
+    )
+    replica = Replica(
+        "test", create_db_engine(url=url), create_async_db_engine(url=url)
+    )
+    monkeypatch.setattr(replica_set, "replicas", [])
+    monkeypatch.setattr(replica_set, "sticky_seconds", 5)
+    replica_set.add(replica)
+    return replica
+
+
+@pytest.fixture
+def replica(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> Generator[QueryCounter, None, None]:
+    # Forget the writes of earlier tests
+    client.cookies.clear()
+    replica = use_replica(monkeypatch)
+    # Only statements run on the replica's own engines
+    with QueryCounter(replica.engine, replica.async_engine.sync_engine) as counter:
+        yield counter
+    replica.engine.dispose()
+
+
+def test_reads_go_to_replica(
+    client: TestClient, logged_user: dict[str, str], replica: QueryCounter
+) -> None:
+    """Test that receipt reads and the user lookup run on the replica."""
+    principal_cache.clear()
+    response = client.get(
+        f"http://{settings.DOMAIN}:8000/receipts/", headers=logged_user
+    )
+    assert response.status_code == 200
+    assert any("FROM users" in statement for statement in replica.statements)
+    assert any("FROM receipts" in statement for statement in replica.statements)
+
+    before = len(replica.statements)
+    response = client.get(f"http://{settings.DOMAIN}:8000/receipts/public/6")
+    assert response.status_code == 200
+    assert len(replica.statements) > before
+
+
+def test_revalidation_checks_out_no_replica_connection(
+    client: TestClient, replica: QueryCounter
+) -> None:
+    """Test that a 304 answered before any query leaves the replica pools alone."""
+    url = f"http://{settings.DOMAIN}:8000/receipts/public/6"
+    etag = client.get(url).headers["etag"]
+    pools = [
+        replica_set.replicas[0].engine.pool,
+        replica_set.replicas[0].async_engine.pool,
+    ]
+    before = [get_pool_stats(pool).checkouts for pool in pools]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert [get_pool_stats(pool).checkouts for pool in pools] == before
+
+
+def test_reads_stay_on_primary_after_write(
+    client: TestClient, logged_user: dict[str, str], replica: QueryCounter
+) -> None:
+    """Test that a client who just wrote reads their writes from the primary.
+
+    The last write cookie carries this to whichever worker serves the read."""
+    data = {
+        "user_id": 2,
+        "sale_items": [{"product_id": 2, "quantity": 1}],
+        "payment_type": "card",
+        "payment_amount": 620000,
+    }
+    response = client.post(
+        f"http://{settings.DOMAIN}:8000/receipts/", headers=logged_user, json=data
+    )
+    assert response.status_code == 200
+    assert LAST_WRITE_COOKIE in response.cookies
+    assert replica.statements == []
+
+    url = f"http://{settings.DOMAIN}:8000/receipts/"
+    response = client.get(url, headers=logged_user)
+    assert response.status_code == 200
+    assert replica.statements == []
+
+    # Without the cookie, or once the write is old enough, reads use the replica
+    client.cookies.set(LAST_WRITE_COOKIE, str(time.time() - 60))
+    assert client.get(url, headers=logged_user).status_code == 200
+    assert any("FROM receipts" in statement for statement in replica.statements)
+
+
+def test_login_reads_from_replica_and_rehashes_on_primary(
+    client: TestClient, replica: QueryCounter
+) -> None:
+    """Test that writes of a replica-routed session still reach the primary."""
+    username, password = "replica-rehash", "secret"
+    # A hash below the configured work factor, which login upgrades
+    weak_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(password)
+    with SessionLocal() as db:
+        user = crud.get_user_by_username(db, username)
+        if user is None:
+            user = User(name=username, username=username)
+            db.add(user)
+        user.hashed_password = weak_hash
+        db.commit()
+
+    response = client.post(
+        f"http://{settings.DOMAIN}:8000/token",
+        data={"username": username, "password": password},
+    )
+    assert response.status_code == 200
+    assert any("FROM users" in statement for statement in replica.statements)
+    assert not any("UPDATE" in statement for statement in replica.statements)
+    with SessionLocal() as db:
+        stored_hash = crud.get_user_by_username(db, username).hashed_password
+    assert stored_hash != weak_hash
+    assert not password_hasher.context.needs_update(stored_hash)
+
+
+def test_unreachable_replica_fails_over_to_primary(
+    client: TestClient, logged_user: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that reads fall back to the primary while a replica is down."""
+    client.cookies.clear()
+    replica = use_replica(monkeypatch, port=1)
+    response = client.get(
+        f"http://{settings.DOMAIN}:8000/receipts/", headers=logged_user
+    )
+    assert response.status_code == 200
+    assert not replica.healthy
+    assert replica_set.choose() is None
@@ -0,0 +1,122 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+import app.crud as crud
+from app import rollups
+from app.core.config import settings
+from app.models import Receipt, User
+from app.schemas import ReceiptCreate, SaleItemCreate
+
+DAY = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def test_create_receipt_updates_rollups(db_test) -> None:
+    """Test that a new receipt is added to the rollups in its transaction."""
+
+    user = crud.get_user_by_username(db_test, settings.FIRST_LOGIN)
+    now = datetime.now(timezone.utc)
+    date_from, date_to = now - timedelta(days=3), now + timedelta(hours=1)
+    before = {
+        row.payment_type: row
+        for row in rollups.get_summary(db_test, user.id, date_from, date_to)
+    }
+
+    receipt = crud.create_receipt(
+        db_test,
+        ReceiptCreate(
+            user_id=user.id,
+            sale_items=[SaleItemCreate(product_id=2, quantity=3)],
+            payment_type="rollup-test",
+            payment_amount=2000000,
+        ),
+        user,
+    )
+
+    after = {
+        row.payment_type: row
+        for row in rollups.get_summary(db_test, user.id, date_from, date_to)
+    }
+    assert "rollup-test" not in before
+    assert after["rollup-test"] == ("rollup-test", 1, receipt.total, 2000000)
+    assert {k: v for k, v in after.items() if k != "rollup-test"} == before
+
+
+def test_summary_combines_daily_and_hourly_rollups(
+    db_test, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that any hour-aligned range sums exactly the receipts inside it."""
+
+    user = User(name="Rollup", username="rollup", hashed_password="-")
+    db_test.add(user)
+    db_test.flush()
+    created = [
+        (DAY + timedelta(hours=22, minutes=30), "cash", 10.0),
+        (DAY + timedelta(days=1, hours=10), "card", 20.0),
+        (DAY + timedelta(days=2, hours=1, minutes=15), "cash", 40.0),
+        (DAY + timedelta(days=2, hours=5), "cash", 80.0),
+    ]
+    receipts = [
+        Receipt(
+            user_id=user.id,
+            created_at=created_at,
+            payment_type=payment_type,
+            payment_amount=total,
+            total=total,
+            change_given=0,
+        )
+        for created_at, payment_type, total in created
+    ]
+    db_test.add_all(receipts)
+    db_test.flush()
+    rollups.add_receipts(db_test, [receipt.id for receipt in receipts])
+
+    summary = rollups.get_summary(
+        db_test, user.id, DAY + timedelta(hours=22), DAY + timedelta(days=2, hours=2)
+    )
+    assert summary == [("card", 1, 20.0, 20.0), ("cash", 2, 50.0, 50.0)]
+
+    # Naive bounds are UTC, whatever the server's timezone
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        naive = DAY.replace(tzinfo=None)
+        assert (
+            rollups.get_summary(
+                db_test,
+                user.id,
+                naive + timedelta(hours=22),
+                naive + timedelta(days=2, hours=2),
+            )
+            == summary
+        )
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    periods = rollups.get_periods(db_test, user.id, "day", DAY, DAY + timedelta(days=3))
+    assert [(period.period_start, period.receipts) for period in periods] == [
+        (DAY, 1),
+        (DAY + timedelta(days=1), 1),
+        (DAY + timedelta(days=2), 2),
+    ]
+
+
+def test_backfill_matches_receipts(db_test) -> None:
+    """Test that rebuilt rollups hold the same totals as the receipts."""
+
+    rollups.backfill(db_test)
+
+    receipts, total = db_test.execute(
+        select(func.count(), func.sum(Receipt.total)).where(Receipt.user_id == 2)
+    ).one()
+    summary = rollups.get_summary(
+        db_test,
+        2,
+        datetime(2000, 1, 1, tzinfo=timezone.utc),
+        datetime.now(timezone.utc) + timedelta(hours=1),
+    )
+    assert sum(row.receipts for row in summary) == receipts
+    assert sum(row.total for row in summary) == pytest.approx(total)
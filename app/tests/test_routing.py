@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from app import schemas
+from app.api.routing import FastJSONRoute
+from app.models import Receipt, SaleItem
+
+
+def make_receipts(count: int) -> list[Receipt]:
+    return [
+        Receipt(
+            id=receipt_id,
+            created_at=datetime(2024, 5, 6, 10, 23, tzinfo=timezone.utc),
+            user_id=2,
+            payment_type="картка",
+            payment_amount=1600000.0,
+            total=1516610.0,
+            sale_items=[
+                SaleItem(product_id=1, quantity=2.0),
+                SaleItem(product_id=3, quantity=0.5),
+            ],
+        )
+        for receipt_id in range(count)
+    ]
+
+
+def make_app(route_class: type[APIRoute]) -> FastAPI:
+    router = APIRouter(route_class=route_class)
+
+    @router.get("/receipts", response_model=list[schemas.Receipt])
+    async def read_receipts(response: Response) -> list[Receipt]:
+        response.headers["X-Next-Cursor"] = "next"
+        return make_receipts(3)
+
+    @router.get("/receipts/validated", response_model=list[schemas.Receipt])
+    async def read_validated_receipts() -> list[schemas.Receipt]:
+        return [
+            schemas.Receipt.model_validate(r, from_attributes=True)
+            for r in make_receipts(3)
+        ]
+
+    @router.post("/receipts", response_model=schemas.Receipt, status_code=201)
+    def create_receipt() -> Receipt:
+        return make_receipts(1)[0]
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+def test_fast_json_route_matches_default_encoding() -> None:
+    """Test that FastJSONRoute sends the same bytes and headers as FastAPI."""
+
+    default = TestClient(make_app(APIRoute))
+    fast = TestClient(make_app(FastJSONRoute))
+    for method, path in [
+        ("GET", "/receipts"),
+        ("GET", "/receipts/validated"),
+        ("POST", "/receipts"),
+    ]:
+        expected = default.request(method, path)
+        response = fast.request(method, path)
+        assert response.status_code == expected.status_code
+        assert response.content == expected.content
+        assert response.headers.get("x-next-cursor") == expected.headers.get(
+            "x-next-cursor"
+        )
+        assert response.headers["content-type"] == expected.headers["content-type"]
@@ -0,0 +1,40 @@
+import asyncio
+
+from passlib.context import CryptContext
+
+from app.security import PasswordHasher, password_hasher
+
+
+def test_hash_and_verify() -> None:
+    """Test hashing and verifying passwords on the hashing pool."""
+
+    hashed = password_hasher.hash("securepassword123")
+    completed = password_hasher.stats().completed
+
+    valid, new_hash = asyncio.run(
+        password_hasher.verify_and_update("securepassword123", hashed)
+    )
+    assert valid
+    assert new_hash is None
+    assert password_hasher.stats().completed == completed + 1
+    assert password_hasher.stats().queue_depth == 0
+
+    valid, _ = asyncio.run(password_hasher.verify_and_update("incorrect", hashed))
+    assert not valid
+
+
+def test_verify_rehashes_below_work_factor() -> None:
+    """Test that a hash below the configured work factor gets upgraded."""
+
+    weak_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5, bcrypt__min_rounds=5)
+    hasher = PasswordHasher(context, max_workers=1)
+    try:
+        valid, new_hash = asyncio.run(hasher.verify_and_update("secret", weak_hash))
+    finally:
+        hasher.shutdown()
+
+    assert valid
+    assert new_hash is not None
+    assert context.verify("secret", new_hash)
+    assert not context.needs_update(new_hash)
@@ -0,0 +1,79 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+
+from app import main
+from app.cache import product_cache
+from app.core.config import settings
+from app.database import (
+    async_engine,
+    create_async_db_engine,
+    create_db_engine,
+    engine,
+    get_pool_stats,
+)
+from app.main import app
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+@pytest.fixture
+def production_startup(monkeypatch: pytest.MonkeyPatch) -> None:
+    command.upgrade(Config(str(ALEMBIC_INI)), "head")
+    monkeypatch.setattr(settings, "STARTUP_SCHEMA", "verify")
+    monkeypatch.setattr(settings, "DB_POOL_WARMUP", 2)
+    monkeypatch.setattr(settings, "STARTUP_PRELOAD_PRODUCTS", True)
+    monkeypatch.setattr(settings, "STARTUP_PRELOAD_SIGNING_KEY", True)
+
+
+def test_startup_verifies_and_warms(production_startup) -> None:
+    """Test that a migrated database passes the check and caches are warmed."""
+    product_cache.clear()
+    with TestClient(app) as client:
+        response = client.get(f"http://{settings.DOMAIN}:8000/ready")
+        assert response.status_code == 200
+        assert product_cache.stats().size >= 3
+        pool = async_engine.pool if settings.DB_MODE == "async" else engine.pool
+        assert get_pool_stats(pool).checked_in >= 2
+    assert app.state.ready is False
+
+
+def test_startup_rejects_other_schema_version(
+    production_startup, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a worker refuses to start against an unexpected schema."""
+    monkeypatch.setattr(main, "SCHEMA_VERSION", "9999")
+    with pytest.raises(RuntimeError, match="9999"):
+        with TestClient(app):
+            pass
+    assert app.state.ready is False
+
+
+def test_warmup_stays_within_worker_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that warmup opens no more than the worker's share of the budget."""
+    monkeypatch.setattr(settings, "DB_CONNECTION_BUDGET", 16)
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+
+    async def scenario() -> int:
+        # Engines sized like a worker's under this budget: pool 2, no overflow
+        budget_engine = create_db_engine(pool_timeout=1)
+        budget_async_engine = create_async_db_engine(pool_timeout=1)
+        monkeypatch.setattr(main, "engine", budget_engine)
+        monkeypatch.setattr(main, "async_engine", budget_async_engine)
+        try:
+            await main.warm_pool(5)
+            pool = (
+                budget_async_engine.pool
+                if settings.DB_MODE == "async"
+                else budget_engine.pool
+            )
+            return get_pool_stats(pool).checked_in
+        finally:
+            budget_engine.dispose()
+            await budget_async_engine.dispose()
+
+    assert asyncio.run(scenario()) == 2
@@ -0,0 +1,65 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """Collect the SQL statements run on any engine while it is active.
+
+    Listens on the ``Engine`` class, so statements of the app engines,
+    the async engine (through its sync engine) and the ``db_test``
+    fixture are all counted, whichever thread runs them. Given engines,
+    only the statements of those are collected.
+    """
+
+    def __init__(self, *engines: Engine) -> None:
+        self.statements: list[str] = []
+        self._targets: tuple[Engine | type[Engine], ...] = engines or (Engine,)
+
+    def _record(
+        self,
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __enter__(self) -> "QueryCounter":
+        for target in self._targets:
+            event.listen(target, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        for target in self._targets:
+            event.remove(target, "before_cursor_execute", self._record)
+
+
+@contextmanager
+def assert_query_budget(budget: int, label: str = "") -> Iterator[QueryCounter]:
+    """Fail the test if the block runs more than ``budget`` SQL statements.
+
+    Args:
+        budget (int): Most statements allowed.
+        label (str): What is being measured, for the failure message.
+    """
+    with QueryCounter() as counter:
+        yield counter
+    if counter.count > budget:
+        statements = "\n\n".join(
+            " ".join(statement.split()) for statement in counter.statements
+        )
+        pytest.fail(
+            f"{label or 'Block'} ran {counter.count} SQL statements, "
+            f"over its budget of {budget}:\n\n{statements}"
+        )
@@ -0,0 +1,309 @@
+"""Measure throughput and latency of the API hot paths.
+
+Each scenario sends ``--requests`` requests from ``--concurrency``
+concurrent clients and reports throughput and p50/p95/p99 latency.
+By default the app is served in-process; pass ``--url`` to load a
+running server instead. Seed the database with ``benchmarks.seed`` first::
+
+    POSTGRES_DB=checkbox_bench python -m benchmarks.load --output results.json
+    POSTGRES_DB=checkbox_bench python -m benchmarks.load --compare results.json
+
+With ``--compare`` the results are checked against a stored baseline and
+the exit status is 1 if any scenario regressed by more than ``--threshold``.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import httpx
+from sqlalchemy import func, select
+
+from app.database import engine
+from app.models import Product, Receipt, User
+
+from .seed import BENCH_PASSWORD
+
+RequestFactory = Callable[[random.Random], dict[str, Any]]
+
+
+@dataclass
+class ScenarioResult:
+    requests: int
+    errors: int
+    seconds: float
+    throughput: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+def _summarize(timings: list[float], errors: int, seconds: float) -> ScenarioResult:
+    cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+    return ScenarioResult(
+        requests=len(timings),
+        errors=errors,
+        seconds=seconds,
+        throughput=len(timings) / seconds if seconds else 0.0,
+        mean_ms=statistics.mean(timings) * 1000,
+        p50_ms=cuts[49] * 1000,
+        p95_ms=cuts[94] * 1000,
+        p99_ms=cuts[98] * 1000,
+    )
+
+
+def _dataset() -> dict[str, Any]:
+    with engine.connect() as connection:
+        user = connection.execute(
+            select(User.id, User.username)
+            .where(User.username.like("bench\\_%"))
+            .order_by(User.id)
+            .limit(1)
+        ).one_or_none()
+        if user is None:
+            sys.exit("No benchmark users found, run `python -m benchmarks.seed` first")
+        receipt_ids = connection.execute(
+            select(func.min(Receipt.id), func.max(Receipt.id))
+        ).one()
+        product_ids = connection.execute(
+            select(func.min(Product.id), func.max(Product.id))
+        ).one()
+    return {
+        "user_id": user.id,
+        "username": user.username,
+        "receipt_ids": tuple(receipt_ids),
+        "product_ids": tuple(product_ids),
+    }
+
+
+def scenarios(data: dict[str, Any]) -> dict[str, RequestFactory]:
+    """Build the request factories of every benchmarked endpoint.
+
+    Args:
+        data (dict[str, Any]): Ids and credentials from the seeded database.
+    """
+    now = datetime.now(timezone.utc)
+
+    def receipt_id(rng: random.Random) -> int:
+        return rng.randint(*data["receipt_ids"])
+
+    def basket(rng: random.Random) -> dict[str, Any]:
+        return {
+            "user_id": data["user_id"],
+            "sale_items": [
+                {"product_id": rng.randint(*data["product_ids"]), "quantity": 1}
+                for _ in range(rng.randint(1, 5))
+            ],
+            "payment_type": rng.choice(["cash", "card"]),
+            "payment_amount": 1_000_000,
+        }
+
+    def list_receipts(**params: Any) -> RequestFactory:
+        return lambda rng: {"method": "GET", "url": "/receipts/", "params": params}
+
+    return {
+        "create_receipt": lambda rng: {
+            "method": "POST",
+            "url": "/receipts/",
+            "json": basket(rng),
+        },
+        "list_receipts": list_receipts(limit=100),
+        "list_receipts_date_from": list_receipts(
+            limit=100, date_from=(now - timedelta(days=30)).isoformat()
+        ),
+        "list_receipts_date_to": list_receipts(
+            limit=100, date_to=(now - timedelta(days=30)).isoformat()
+        ),
+        "list_receipts_min_total": list_receipts(limit=100, min_total=5000),
+        "list_receipts_payment_type": list_receipts(limit=100, payment_type="card"),
+        "public_receipt": lambda rng: {
+            "method": "GET",
+            "url": f"/receipts/public/{receipt_id(rng)}",
+        },
+        "receipt_text": lambda rng: {
+            "method": "GET",
+            "url": f"/receipts/{receipt_id(rng)}/text",
+        },
+        "token": lambda rng: {
+            "method": "POST",
+            "url": "/token",
+            "data": {"username": data["username"], "password": BENCH_PASSWORD},
+        },
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    factory: RequestFactory,
+    requests: int,
+    concurrency: int,
+    seed: int,
+) -> ScenarioResult:
+    """Send ``requests`` requests from ``concurrency`` concurrent workers.
+
+    Args:
+        client (httpx.AsyncClient): Client of the app under test.
+        factory (RequestFactory): Builds the arguments of each request.
+        requests (int): Requests to send.
+        concurrency (int): Concurrent workers.
+        seed (int): Random seed of the request arguments.
+    """
+    rng = random.Random(seed)
+    pending = [factory(rng) for _ in range(requests)]
+    timings: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while pending:
+            arguments = pending.pop()
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(**arguments)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            timings.append(time.perf_counter() - started_at)
+            errors += failed
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summarize(timings, errors, time.perf_counter() - started_at)
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    data = _dataset()
+    if args.url:
+        transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport()
+        base_url = args.url
+    else:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+        base_url = "http://benchmark"
+
+    selected = scenarios(data)
+    if args.scenario:
+        selected = {name: selected[name] for name in args.scenario}
+
+    results = {}
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url, timeout=60
+    ) as client:
+        response = await client.post(
+            "/token", data={"username": data["username"], "password": BENCH_PASSWORD}
+        )
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        for name, factory in selected.items():
+            # Warm up caches and pooled connections before measuring
+            await run_scenario(client, factory, args.concurrency, args.concurrency, 1)
+            result = await run_scenario(
+                client, factory, args.requests, args.concurrency, args.seed
+            )
+            results[name] = result
+            print(
+                f"{name:<28}{result.throughput:>10.1f}/s"
+                f"{result.p50_ms:>10.2f}{result.p95_ms:>10.2f}{result.p99_ms:>10.2f}"
+                f"{result.errors:>8}"
+            )
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "target": args.url or "in-process",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": {name: asdict(result) for name, result in results.items()},
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(
+    baseline: dict[str, Any], current: dict[str, Any], threshold: float
+) -> list[str]:
+    """List the scenarios that got slower than the baseline allows.
+
+    A scenario regresses when its throughput drops or its p95 latency
+    grows by more than ``threshold`` (a fraction, e.g. 0.1 for 10%).
+
+    Args:
+        baseline (dict[str, Any]): Stored results.
+        current (dict[str, Any]): Results of this run.
+        threshold (float): Tolerated relative change.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        if result["throughput"] < before["throughput"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {before['throughput']:.1f}/s"
+                f" -> {result['throughput']:.1f}/s"
+            )
+        if result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenario", action="append", help="run only these scenarios")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    print(
+        f"{'scenario':<28}{'throughput':>12}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'errors':>8}"
+    )
+    current = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), current, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Seed the configured database with a synthetic dataset for benchmarks.
+
+Rows are generated on the fly and loaded with ``COPY``, so millions of
+receipts load in minutes with flat memory. Point ``POSTGRES_DB`` at a
+dedicated database first, the data is added to whatever is there::
+
+    POSTGRES_DB=checkbox_bench python -m benchmarks.seed --receipts 1000000
+
+Every seeded user logs in as ``bench_<n>`` with the password ``benchmark``.
+"""
+
+import argparse
+import csv
+import io
+import random
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import text
+
+from app import rollups
+from app.database import engine
+from app.dependencies import SessionLocal
+from app.models import create_tables
+from app.security import pwd_context
+
+BENCH_PASSWORD = "benchmark"
+PAYMENT_TYPES = ("cash", "card")
+RECEIPT_SLICE_SIZE = 100_000
+
+
+class _RowStream(io.TextIOBase):
+    """File-like CSV view of a row generator, read by ``COPY`` chunk by chunk."""
+
+    def __init__(self, rows: Iterator[tuple[Any, ...]]) -> None:
+        self._rows = rows
+        self._buffer = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int | None = -1) -> str:
+        size = 1 << 16 if size is None or size < 0 else size
+        if len(self._buffer) < size:
+            chunk = io.StringIO()
+            writer = csv.writer(chunk)
+            for row in self._rows:
+                writer.writerow(row)
+                if chunk.tell() >= size:
+                    break
+            self._buffer += chunk.getvalue()
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    readline = read  # type: ignore[assignment]
+
+
+def _copy(table: str, columns: list[str], rows: Iterator[tuple[Any, ...]]) -> None:
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                _RowStream(rows),
+                size=1 << 20,
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _next_id(table: str) -> int:
+    with engine.connect() as connection:
+        return connection.execute(
+            text(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")
+        ).scalar_one()
+
+
+def _reset_sequence(table: str) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT max(id) FROM {table}))"
+            )
+        )
+
+
+def _timed(label: str, load: Callable[[], None]) -> None:
+    started_at = time.perf_counter()
+    load()
+    print(f"{label}: {time.perf_counter() - started_at:.1f}s")
+
+
+def seed(
+    users: int, products: int, receipts: int, items: int, days: int, seed: int
+) -> None:
+    """Load users, products and receipts with their sale items.
+
+    Args:
+        users (int): Users to create.
+        products (int): Products to create.
+        receipts (int): Receipts to create, spread evenly over the users.
+        items (int): Most sale items per receipt.
+        days (int): Receipts are dated over this many days up to now.
+        seed (int): Random seed, for a reproducible dataset.
+    """
+    rng = random.Random(seed)
+    create_tables()
+
+    first_user = _next_id("users")
+    user_ids = range(first_user, first_user + users)
+    hashed_password = pwd_context.hash(BENCH_PASSWORD)
+    _timed(
+        f"{users} users",
+        lambda: _copy(
+            "users",
+            ["id", "name", "username", "hashed_password"],
+            (
+                (user_id, f"Bench {user_id}", f"bench_{user_id}", hashed_password)
+                for user_id in user_ids
+            ),
+        ),
+    )
+
+    first_product = _next_id("products")
+    prices = {
+        product_id: round(rng.uniform(1, 5000), 2)
+        for product_id in range(first_product, first_product + products)
+    }
+    _timed(
+        f"{products} products",
+        lambda: _copy(
+            "products",
+            ["id", "name", "price"],
+            (
+                (product_id, f"Product {product_id}", price)
+                for product_id, price in prices.items()
+            ),
+        ),
+    )
+
+    now = datetime.now(timezone.utc)
+    product_ids = list(prices)
+    receipt_columns = [
+        "id",
+        "created_at",
+        "user_id",
+        "payment_type",
+        "payment_amount",
+        "total",
+        "change_given",
+    ]
+    item_columns = ["id", "receipt_id", "product_id", "quantity", "total_price"]
+
+    def load_slice(first_receipt: int, count: int) -> None:
+        baskets: list[tuple[int, list[tuple[int, float, float]]]] = []
+
+        def receipt_rows() -> Iterator[tuple[Any, ...]]:
+            for receipt_id in range(first_receipt, first_receipt + count):
+                basket = []
+                for _ in range(rng.randint(1, items)):
+                    product_id = rng.choice(product_ids)
+                    quantity = float(rng.randint(1, 5))
+                    basket.append((product_id, quantity, prices[product_id] * quantity))
+                baskets.append((receipt_id, basket))
+                total = sum(item[2] for item in basket)
+                payment_amount = float(round(total + rng.randint(0, 500)))
+                created_at = now - timedelta(seconds=rng.uniform(0, days * 86400))
+                yield (
+                    receipt_id,
+                    created_at.isoformat(),
+                    user_ids[receipt_id % users],
+                    rng.choice(PAYMENT_TYPES),
+                    payment_amount,
+                    total,
+                    payment_amount - total,
+                )
+
+        def sale_item_rows() -> Iterator[tuple[Any, ...]]:
+            item_id = _next_id("sale_items")
+            for receipt_id, basket in baskets:
+                for product_id, quantity, total_price in basket:
+                    yield item_id, receipt_id, product_id, quantity, total_price
+                    item_id += 1
+
+        _copy("receipts", receipt_columns, receipt_rows())
+        _copy("sale_items", item_columns, sale_item_rows())
+
+    def load_receipts() -> None:
+        # Loaded in slices, so only one slice of baskets is held in memory
+        first_receipt = _next_id("receipts")
+        for offset in range(0, receipts, RECEIPT_SLICE_SIZE):
+            load_slice(
+                first_receipt + offset, min(RECEIPT_SLICE_SIZE, receipts - offset)
+            )
+
+    _timed(f"{receipts} receipts", load_receipts)
+    for table in ("users", "products", "receipts", "sale_items"):
+        _reset_sequence(table)
+
+    def backfill() -> None:
+        with SessionLocal() as session:
+            rollups.backfill(session)
+
+    _timed("sales rollups", backfill)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=5, help="most items per receipt")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    seed(args.users, args.products, args.receipts, args.items, args.days, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare FastAPI's default response encoding with ``FastJSONRoute``.
+
+Serves a page of in-memory receipts through both route classes, so only
+validation and JSON encoding are measured, no database access::
+
+    python -m benchmarks.serialization --page-size 100 --requests 500
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from app import schemas
+from app.api.routing import FastJSONRoute
+from app.models import Receipt, SaleItem
+
+
+def make_receipts(count: int, items: int) -> list[Receipt]:
+    created_at = datetime(2024, 5, 6, 10, 23, tzinfo=timezone.utc)
+    return [
+        Receipt(
+            id=receipt_id,
+            created_at=created_at,
+            user_id=1,
+            payment_type="cash",
+            payment_amount=1600000.0,
+            total=1516610.0,
+            sale_items=[
+                SaleItem(product_id=product_id, quantity=1.5)
+                for product_id in range(items)
+            ],
+        )
+        for receipt_id in range(count)
+    ]
+
+
+def make_client(route_class: type[APIRoute], receipts: list[Receipt]) -> TestClient:
+    router = APIRouter(route_class=route_class)
+
+    @router.get("/receipts/", response_model=list[schemas.Receipt])
+    async def read_receipts() -> list[Receipt]:
+        return receipts
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def measure(client: TestClient, requests: int) -> list[float]:
+    client.get("/receipts/")
+    timings = []
+    for _ in range(requests):
+        started_at = time.perf_counter()
+        client.get("/receipts/")
+        timings.append(time.perf_counter() - started_at)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--items", type=int, default=3, help="sale items per receipt")
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    receipts = make_receipts(args.page_size, args.items)
+    results = {
+        name: measure(make_client(route_class, receipts), args.requests)
+        for name, route_class in [("default", APIRoute), ("fast_json", FastJSONRoute)]
+    }
+
+    print(f"{'route':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, timings in results.items():
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(
+            f"{name:<10}{statistics.mean(timings) * 1000:>10.2f}"
+            f"{statistics.median(timings) * 1000:>10.2f}{p95 * 1000:>10.2f}"
+        )
+    speedup = statistics.mean(results["default"]) / statistics.mean(
+        results["fast_json"]
+    )
+    print(f"speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()